@@ -0,0 +1,260 @@
+# /backend/admission.py
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from werkzeug.exceptions import ServiceUnavailable
+
+# Factor de suavizado de las medias móviles exponenciales (EWMA)
+EWMA_ALPHA = 0.2
+
+# Cada cuánto comprueba una llamada en cola si se ha cancelado
+CANCEL_POLL_SECONDS = 0.05
+
+
+class Overloaded(ServiceUnavailable):
+    """
+    Petición rechazada por control de admisión (503 + Retry-After)
+    """
+
+    def __init__(self, description, retry_after):
+        super().__init__(description=description, retry_after=max(1, math.ceil(retry_after)))
+        self.retry_seconds = max(1, math.ceil(retry_after))
+
+
+class Cancelled(Exception):
+    """
+    La llamada al modelo se canceló antes de empezar (ya no hace falta)
+    """
+
+
+# Carriles de admisión: "model" puede llamar al modelo; "cheap" solo puede
+# resolverse sin él (caché de resultados, índice visual)
+MODEL_LANE = "model"
+CHEAP_LANE = "cheap"
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.inflight = 0
+        self.cheap_inflight = 0
+        self.admitted = 0
+        self.admitted_cheap = 0
+        self.rejected = 0
+        self.latency = None
+        self.queue_wait = None
+
+
+def _ewma(current, sample):
+    return sample if current is None else (1 - EWMA_ALPHA) * current + EWMA_ALPHA * sample
+
+
+class AdmissionController:
+    """
+    Control de admisión en dos niveles para las rutas de análisis.
+
+    1. Entrada: antes de leer el cuerpo de la subida se estima la espera en
+       la cola del modelo (profundidad de cola x latencia del modelo). Si el
+       SLO se respeta y hay cupo, la petición entra en el carril del modelo;
+       si no, entra en un carril barato con su propio cupo, donde solo puede
+       resolverse sin el modelo (caché, índice visual); las rutas sin esa vía
+       no tienen carril barato. Sin cupo se rechaza sin haber leído nada.
+    2. Modelo: las llamadas caras (Gemini) compiten por un número fijo de
+       slots. Si la espera estimada pone en riesgo el SLO se rechaza en el
+       momento, y las peticiones del carril barato no llegan a esperar.
+    """
+
+    def __init__(self, slo_seconds=30.0, max_inflight=32, model_concurrency=4, max_model_free=None):
+        self.slo_seconds = slo_seconds
+        self.max_inflight = max_inflight
+        self.model_concurrency = model_concurrency
+        self.max_model_free = max_inflight if max_model_free is None else max_model_free
+
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._model_slots = threading.BoundedSemaphore(model_concurrency)
+        self._model_waiting = 0
+        self._model_running = 0
+        self._model_latency = None
+
+    def _stats(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats()
+        return stats
+
+    def _estimated_model_wait(self, position):
+        """
+        Espera estimada para quien está en la posición `position` de la cola del modelo
+        """
+        if self._model_latency is None:
+            return 0.0
+        return (position // self.model_concurrency) * self._model_latency
+
+    def _model_queue_wait(self, elapsed=0.0):
+        """
+        Espera estimada si la cola del modelo pone en riesgo el SLO, o None.
+
+        La profundidad de la cola incluye las peticiones del carril del modelo
+        que aún no han llegado a pedir slot: casi todas lo harán.
+        """
+        pending = sum(stats.inflight for stats in self._endpoints.values())
+        position = max(self._model_waiting + self._model_running, pending)
+        if position < self.model_concurrency:
+            return None
+
+        estimated_wait = self._estimated_model_wait(position)
+        if elapsed + estimated_wait + (self._model_latency or 0.0) <= self.slo_seconds:
+            return None
+        return estimated_wait
+
+    def admit(self, endpoint, cheap_lane=True):
+        """
+        Admite una petición en la entrada o lanza Overloaded.
+        Devuelve (inicio, carril). Las rutas que no pueden resolverse sin el
+        modelo pasan `cheap_lane=False`: si el carril del modelo no tiene
+        cupo se rechazan aquí, antes de leer nada.
+        """
+        with self._lock:
+            stats = self._stats(endpoint)
+            model_wait = self._model_queue_wait()
+
+            if model_wait is None and stats.inflight < self.max_inflight:
+                stats.inflight += 1
+                stats.admitted += 1
+                return time.monotonic(), MODEL_LANE
+
+            if cheap_lane and stats.cheap_inflight < self.max_model_free:
+                stats.cheap_inflight += 1
+                stats.admitted_cheap += 1
+                return time.monotonic(), CHEAP_LANE
+
+            stats.rejected += 1
+            if model_wait is not None:
+                raise Overloaded(f"Cola del modelo saturada: espera estimada {model_wait:.1f}s", model_wait)
+            raise Overloaded(
+                f"Servidor saturado: {stats.inflight} análisis en curso en {endpoint}",
+                stats.latency or self.slo_seconds
+            )
+
+    def mark_model_free(self, endpoint, lane):
+        """
+        Pasa al carril barato una petición que se ha resuelto sin el modelo,
+        para que deje de ocupar cupo del carril del modelo. Devuelve el carril nuevo.
+        """
+        if lane != MODEL_LANE:
+            return lane
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.inflight = max(0, stats.inflight - 1)
+            stats.cheap_inflight += 1
+        return CHEAP_LANE
+
+    def release(self, endpoint, started_at, lane=MODEL_LANE):
+        """
+        Libera una petición admitida y actualiza la latencia del endpoint
+        """
+        with self._lock:
+            stats = self._stats(endpoint)
+            if lane == CHEAP_LANE:
+                stats.cheap_inflight = max(0, stats.cheap_inflight - 1)
+            else:
+                stats.inflight = max(0, stats.inflight - 1)
+                stats.latency = _ewma(stats.latency, time.monotonic() - started_at)
+
+    @contextmanager
+    def model_slot(self, endpoint, started_at=None, lane=MODEL_LANE, cancelled=None):
+        """
+        Reserva un slot de llamada al modelo respetando el SLO de latencia.
+        Si el evento `cancelled` se activa mientras espera en la cola, abandona
+        la cola (o devuelve el slot recién obtenido) con Cancelled.
+        """
+        elapsed = time.monotonic() - started_at if started_at is not None else 0.0
+
+        with self._lock:
+            position = self._model_waiting + self._model_running
+            estimated_wait = self._estimated_model_wait(position)
+
+            if lane == CHEAP_LANE:
+                self._stats(endpoint).rejected += 1
+                raise Overloaded(
+                    "Modelo saturado: solo se atienden resultados que no requieren un análisis nuevo",
+                    estimated_wait or self._model_latency or self.slo_seconds
+                )
+
+            expected_total = elapsed + estimated_wait + (self._model_latency or 0.0)
+
+            if position >= self.model_concurrency and expected_total > self.slo_seconds:
+                self._stats(endpoint).rejected += 1
+                raise Overloaded(
+                    f"Cola del modelo saturada: espera estimada {estimated_wait:.1f}s",
+                    estimated_wait
+                )
+            self._model_waiting += 1
+
+        wait_started = time.monotonic()
+        deadline = wait_started + max(0.0, self.slo_seconds - elapsed)
+        acquired = False
+        while not (cancelled is not None and cancelled.is_set()):
+            remaining = deadline - time.monotonic()
+            if cancelled is not None:
+                remaining = min(remaining, CANCEL_POLL_SECONDS)
+            acquired = self._model_slots.acquire(timeout=max(0.0, remaining))
+            if acquired or time.monotonic() >= deadline:
+                break
+        waited = time.monotonic() - wait_started
+
+        if acquired and cancelled is not None and cancelled.is_set():
+            # Cancelada justo al obtener el slot: se devuelve sin llamar al modelo
+            self._model_slots.release()
+            acquired = False
+
+        was_cancelled = not acquired and cancelled is not None and cancelled.is_set()
+        with self._lock:
+            self._model_waiting -= 1
+            self._stats(endpoint).queue_wait = _ewma(self._stats(endpoint).queue_wait, waited)
+            if acquired:
+                self._model_running += 1
+            elif not was_cancelled:
+                self._stats(endpoint).rejected += 1
+
+        if was_cancelled:
+            raise Cancelled()
+        if not acquired:
+            raise Overloaded("Tiempo de espera agotado en la cola del modelo", self._model_latency or self.slo_seconds)
+
+        call_started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._model_running -= 1
+                self._model_latency = _ewma(self._model_latency, time.monotonic() - call_started)
+            self._model_slots.release()
+
+    def snapshot(self):
+        """
+        Estado actual del control de admisión (para monitorización)
+        """
+        with self._lock:
+            return {
+                "slo_seconds": self.slo_seconds,
+                "max_inflight": self.max_inflight,
+                "model_concurrency": self.model_concurrency,
+                "max_model_free": self.max_model_free,
+                "model_running": self._model_running,
+                "model_waiting": self._model_waiting,
+                "model_latency": round(self._model_latency, 3) if self._model_latency is not None else None,
+                "endpoints": {
+                    endpoint: {
+                        "inflight": stats.inflight,
+                        "cheap_inflight": stats.cheap_inflight,
+                        "admitted": stats.admitted,
+                        "admitted_cheap": stats.admitted_cheap,
+                        "rejected": stats.rejected,
+                        "latency": round(stats.latency, 3) if stats.latency is not None else None,
+                        "queue_wait": round(stats.queue_wait, 3) if stats.queue_wait is not None else None
+                    } for endpoint, stats in self._endpoints.items()
+                }
+            }
@@ -2,7 +2,7 @@
 
 import os
 import google.generativeai as genai
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, has_request_context, make_response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 from PIL import Image
@@ -13,6 +13,28 @@ import base64
 import requests
 import base64
 import requests
+import atexit
+import functools
+import threading
+import time
+from visual_index import VisualIndex, extract_visual_features
+from gazetteer import load_gazetteer
+from signage_crops import TEXT_DETECTION_MAX_SIDE, build_signage_views, downscale, scale_annotations
+from keyframes import select_keyframes
+from admission import MODEL_LANE, AdmissionController, Overloaded
+from profiling import RequestProfiler
+from live_session import LiveSession
+from ensemble import run_ensemble
+from exports import geojson_stream, iter_ndjson, kml_stream
+from shared_state import SharedState, result_key
+from payloads import (
+    MIN_COMPRESS_BYTES, MSGPACK_MIMETYPE, available_encodings, compress, encode_payload, msgpack, parse_fields, shape_payload
+)
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
 
 # Carga la clave API desde el archivo .env
 load_dotenv()
@@ -51,6 +73,83 @@ if GOOGLE_CLOUD_API_KEY:
 if GOOGLE_MAPS_API_KEY:
     print("✓ Google Maps API key configurada")
 
+# Índice visual local sobre imágenes ya geolocalizadas (se consulta antes de llamar a Gemini)
+VISUAL_INDEX_PATH = os.getenv("VISUAL_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "visual_index"))
+VISUAL_INDEX_TOP_K = int(os.getenv("VISUAL_INDEX_TOP_K", "3"))
+VISUAL_INDEX_MIN_SIMILARITY = float(os.getenv("VISUAL_INDEX_MIN_SIMILARITY", "0.80"))
+VISUAL_INDEX_REUSE_THRESHOLD = float(os.getenv("VISUAL_INDEX_REUSE_THRESHOLD", "0.97"))
+# Modo compartido (serve.py): el índice en disco se mapea en memoria y las
+# imágenes nuevas se reparten entre workers a través del estado compartido
+VISUAL_INDEX_SHARED = os.getenv("VISUAL_INDEX_SHARED", "false").lower() == "true"
+
+visual_index = VisualIndex(VISUAL_INDEX_PATH, mmap=VISUAL_INDEX_SHARED)
+if VISUAL_INDEX_SHARED:
+    # Solo persist_shared_index escribe el índice, a la vez que anota la última entrada volcada
+    visual_index.save_every = None
+else:
+    atexit.register(visual_index.save)
+print(f"✓ Índice visual local cargado ({len(visual_index)} imágenes)")
+
+# Estado compartido entre procesos (SQLite en modo WAL): caché de resultados y métricas agregadas
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "shared_state.db"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "86400"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+
+shared_state = SharedState(SHARED_STATE_PATH, RESULT_CACHE_TTL, RESULT_CACHE_MAX_ENTRIES)
+atexit.register(shared_state.flush)
+
+# Gazetteer local para extraer ciudades/países/landmarks de textos sin llamar a APIs
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "places.tsv"))
+gazetteer = load_gazetteer(GAZETTEER_PATH)
+print(f"✓ Gazetteer local cargado ({len(gazetteer)} lugares)")
+
+# Recortes de señalización: vista general reducida + recortes de las regiones con texto
+SIGNAGE_CROPS_ENABLED = os.getenv("SIGNAGE_CROPS", "true").lower() == "true"
+SIGNAGE_MAX_CROPS = int(os.getenv("SIGNAGE_MAX_CROPS", "3"))
+
+# Ingesta de clips animados y ráfagas: solo los fotogramas clave llegan al análisis multi-imagen
+BURST_KEYFRAME_BUDGET = min(int(os.getenv("BURST_KEYFRAME_BUDGET", "6")), 6)
+BURST_MAX_FRAMES = int(os.getenv("BURST_MAX_FRAMES", "600"))
+BURST_MAX_FILES = int(os.getenv("BURST_MAX_FILES", "120"))
+
+# Control de admisión: rechaza pronto (503 + Retry-After) cuando peligra el SLO de latencia
+ADMISSION_SLO_SECONDS = float(os.getenv("ADMISSION_SLO_SECONDS", "30"))
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "32"))
+MODEL_CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", "4"))
+# Cupo aparte para peticiones que se resuelven sin el modelo (caché, índice visual)
+ADMISSION_MAX_MODEL_FREE = int(os.getenv("ADMISSION_MAX_MODEL_FREE", str(ADMISSION_MAX_INFLIGHT)))
+# Solo estas rutas pueden resolverse sin el modelo; las demás no entran en ese cupo
+MODEL_FREE_ROUTES = ("/api/analyze", "/api/analyze-multi")
+
+admission = AdmissionController(ADMISSION_SLO_SECONDS, ADMISSION_MAX_INFLIGHT, MODEL_CONCURRENCY, ADMISSION_MAX_MODEL_FREE)
+
+# Perfilado bajo demanda (cProfile + tracemalloc) de las rutas de análisis
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+
+profiler = RequestProfiler(PROFILING_TOKEN, PROFILING_SAMPLE_RATE, PROFILING_DIR)
+
+# Sesión en vivo por WebSocket (fotogramas de cámara con consulta progresiva)
+LIVE_MAX_KEYFRAMES = min(int(os.getenv("LIVE_MAX_KEYFRAMES", "6")), 6)
+LIVE_REQUERY_NEW_FRAMES = int(os.getenv("LIVE_REQUERY_NEW_FRAMES", "2"))
+LIVE_MIN_REQUERY_SECONDS = float(os.getenv("LIVE_MIN_REQUERY_SECONDS", "5"))
+LIVE_MAX_FRAME_BYTES = int(os.getenv("LIVE_MAX_FRAME_BYTES", str(5 * 1024 * 1024)))
+
+sock = Sock(app) if Sock else None
+if sock:
+    print("✓ Sesión en vivo por WebSocket disponible en /api/live")
+else:
+    print("⚠️  flask-sock no instalado - sesión en vivo deshabilitada")
+
+# Modo ensemble de /api/analyze: N muestras concurrentes agrupadas por distancia
+ENSEMBLE_MAX_SAMPLES = int(os.getenv("ENSEMBLE_MAX_SAMPLES", "7"))
+ENSEMBLE_MAX_PARALLEL = int(os.getenv("ENSEMBLE_MAX_PARALLEL", "5"))
+ENSEMBLE_RADIUS_KM = float(os.getenv("ENSEMBLE_RADIUS_KM", "25"))
+ENSEMBLE_TEMPERATURE = float(os.getenv("ENSEMBLE_TEMPERATURE", "1.0"))
+
+SIGNAGE_CROPS_NOTE = """NOTA SOBRE LAS IMÁGENES: cada imagen se envía como una vista general reducida seguida de recortes en alta resolución de las zonas con texto detectado (señales, matrículas, nombres de calles). Usa los recortes para leer el texto exacto y reporta esa evidencia en el campo Signage."""
+
 def analyze_image_with_google_vision(image_bytes):
     """
     Analiza una imagen usando Google Cloud Vision API REST
@@ -160,8 +259,18 @@ def analyze_image_with_google_vision(image_bytes):
 
 def geocode_with_google_maps(location_name):
     """
-    Geocodifica una ubicación usando Google Maps API
+    Geocodifica una ubicación usando el gazetteer local o, si no está, Google Maps API
     """
+    # Un país no tiene una coordenada puntual: se deja a Google Maps (centroide)
+    place = gazetteer.lookup(location_name)
+    if place and place["kind"] != "country":
+        return {
+            "lat": place["lat"],
+            "lng": place["lng"],
+            "formatted_address": f"{place['name']}, {place['country']}",
+            "place_id": ""
+        }
+
     if not GOOGLE_MAPS_API_KEY:
         return None
     
@@ -254,6 +363,10 @@ def analyze_image_with_google_vision(image_bytes):
                         {
                             "type": "WEB_DETECTION",
                             "maxResults": 10
+                        },
+                        {
+                            "type": "TEXT_DETECTION",
+                            "maxResults": 10
                         }
                     ]
                 }
@@ -268,8 +381,11 @@ def analyze_image_with_google_vision(image_bytes):
         
         if 'responses' in result and len(result['responses']) > 0:
             web_detection = result['responses'][0].get('webDetection', {})
+            text_annotations = result['responses'][0].get('textAnnotations', [])
             
             return {
+                "detected_text": text_annotations[0].get('description', '') if text_annotations else "",
+                "text_annotations": text_annotations,
                 "web_entities": web_detection.get('webEntities', []),
                 "pages_with_matching_images": web_detection.get('pagesWithMatchingImages', []),
                 "full_matching_images": web_detection.get('fullMatchingImages', []),
@@ -289,11 +405,76 @@ def analyze_image_with_google_vision(image_bytes):
             "pages_with_matching_images": []
         }
 
+def detect_text_with_google_vision(images):
+    """
+    Detecta las regiones de texto de varias imágenes en una sola petición a Vision API.
+    Se envían copias reducidas (una petición con varias fotos a resolución completa
+    supera el límite de Vision) y las cajas se devuelven en coordenadas originales.
+    """
+    if not VISION_API_URL or not images:
+        return [[] for _ in images]
+
+    try:
+        copies = [downscale(image.convert("RGB"), TEXT_DETECTION_MAX_SIDE) for image in images]
+        request_body = {
+            "requests": [
+                {
+                    "image": {
+                        "content": base64.b64encode(encode_jpeg(copy)).decode('utf-8')
+                    },
+                    "features": [
+                        {
+                            "type": "TEXT_DETECTION"
+                        }
+                    ]
+                } for copy in copies
+            ]
+        }
+
+        response = requests.post(VISION_API_URL, json=request_body)
+        response.raise_for_status()
+
+        responses = response.json().get('responses', [])
+        annotations = [
+            scale_annotations(item.get('textAnnotations', []), image.width / copy.width)
+            for item, image, copy in zip(responses, images, copies)
+        ]
+        return annotations + [[] for _ in range(len(images) - len(annotations))]
+
+    except Exception as e:
+        print(f"Error detecting text regions: {str(e)}")
+        return [[] for _ in images]
+
+def encode_jpeg(image, quality=90):
+    """
+    Codifica una imagen PIL como JPEG para las APIs que reciben bytes
+    """
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+def signage_content_parts(image, text_annotations, label):
+    """
+    Prepara las partes del prompt para una imagen: vista general reducida y
+    recortes en alta resolución de las regiones con texto, o la imagen
+    original tal cual si no hay recortes
+    """
+    overview, crops = build_signage_views(image, text_annotations if SIGNAGE_CROPS_ENABLED else None, SIGNAGE_MAX_CROPS)
+    if not crops:
+        return [overview], 0
+
+    parts = [f"{label} (overview):", overview]
+    for i, crop in enumerate(crops):
+        parts += [f"{label} - text region {i + 1} (detected text: {crop['text'][:80]}):", crop["image"]]
+
+    return parts, len(crops)
+
 def extract_location_from_vision_results(vision_results):
     """
     Extrae información de ubicación de los resultados de Google Vision
     """
     location_clues = []
+    gazetteer_texts = [("detected_text", vision_results.get('detected_text', ''), 1.0)]
     
     # Procesar web entities
     for entity in vision_results.get('web_entities', []):
@@ -313,8 +494,26 @@ def extract_location_from_vision_results(vision_results):
                 "source": "page_title",
                 "url": page.get('url', '')
             })
-    
-    return location_clues
+
+    # Resolver lugares concretos (con coordenadas) en una sola pasada del gazetteer
+    gazetteer_texts += [("web_entity", clue["text"], clue["score"]) for clue in location_clues if clue["source"] == "web_entity"]
+    gazetteer_texts += [("page_title", clue["text"], 1.0) for clue in location_clues if clue["source"] == "page_title"]
+
+    # Los países solo aportan el nombre: su fila del gazetteer lleva las
+    # coordenadas de la capital, que no son una ubicación de la imagen
+    place_clues = [{
+        "text": candidate["location"],
+        "score": candidate["confidence"],
+        "source": "gazetteer",
+        "kind": candidate["kind"],
+        "country": candidate["country"],
+        "lat": candidate["lat"] if candidate["kind"] != "country" else None,
+        "lng": candidate["lng"] if candidate["kind"] != "country" else None,
+        "mentions": candidate["mentions"]
+    } for candidate in gazetteer.extract_candidates(gazetteer_texts)]
+
+    # Los lugares resueltos van primero: tienen coordenadas reales
+    return place_clues + location_clues
 
 def parse_osint_response(response_text):
     """
@@ -395,21 +594,405 @@ def parse_osint_response(response_text):
             "error": f"Parsing failed: {str(e)}"
         }
 
+def format_visual_priors(visual_matches):
+    """
+    Convierte las coincidencias del índice visual en pistas previas para el prompt
+    """
+    lines = ["REFERENCIAS VISUALES PREVIAS (escenas similares ya geolocalizadas, úsalas solo si la evidencia coincide):"]
+    for match in visual_matches:
+        lines.append(
+            f"- {match.get('region_or_city', 'Unknown')}, {match.get('country', 'Unknown')}: "
+            f"{match['lat']:.6f}, {match['lng']:.6f} (similitud {match['similarity']:.2f})"
+        )
+    return "\n".join(lines)
+
+def build_result_from_visual_matches(visual_matches):
+    """
+    Construye una respuesta con el formato de parse_osint_response a partir del índice visual
+    """
+    best = visual_matches[0]
+    alternatives = [{"lat": match["lat"], "lng": match["lng"]} for match in visual_matches[1:3]]
+    while len(alternatives) < 2:
+        alternatives.append({"lat": None, "lng": None})
+
+    return {
+        "country": best.get("country", "Unknown"),
+        "region_or_city": best.get("region_or_city", "Unknown"),
+        "confidence": best.get("confidence", "Medium"),
+        "coordinates": f"{best['lat']:.6f}, {best['lng']:.6f}",
+        "reasoning": f"Near-duplicate of a previously geolocated image (similarity {best['similarity']:.2f}). Result reused from the local visual index.",
+        "detailed_analysis": {
+            "primary_coordinates": {
+                "lat": best["lat"],
+                "lng": best["lng"]
+            },
+            "alternative_locations": alternatives,
+            "evidence": {
+                "signage": "Not specified",
+                "infrastructure": "Not specified",
+                "architecture": "Not specified",
+                "environment": "Not specified",
+                "cultural_elements": "Not specified"
+            },
+            "final_assessment": {
+                "most_probable_location": best.get("most_probable_location", "Not specified"),
+                "certainty_percentage": int(best["similarity"] * 100),
+                "primary_landmark": "Not specified"
+            }
+        },
+        "visual_matches": visual_matches
+    }
+
+def index_analysis_result(image_features, analysis_data):
+    """
+    Guarda en el índice visual una imagen analizada con coordenadas válidas
+    """
+    primary = analysis_data.get("detailed_analysis", {}).get("primary_coordinates", {})
+    if primary.get("lat") is None or primary.get("lng") is None:
+        return
+
+    record = {
+        "country": analysis_data.get("country", "Unknown"),
+        "region_or_city": analysis_data.get("region_or_city", "Unknown"),
+        "confidence": analysis_data.get("confidence", "Medium"),
+        "most_probable_location": analysis_data["detailed_analysis"].get("final_assessment", {}).get("most_probable_location", "Not specified")
+    }
+
+    if VISUAL_INDEX_SHARED:
+        shared_state.append_index_entry(image_features, primary["lat"], primary["lng"], record)
+        sync_visual_index()
+    else:
+        visual_index.add(image_features, primary["lat"], primary["lng"], record)
+
+# Última entrada de la cola compartida que ya está en el índice guardado en disco
+INDEX_PERSISTED_META = "visual_index_persisted_id"
+
+_index_sync_lock = threading.Lock()
+# El índice cargado de disco ya contiene las entradas hasta la última volcada:
+# se retoma desde ahí para no duplicarlas tras una parada brusca
+_index_sync_last_id = shared_state.get_meta(INDEX_PERSISTED_META, 0) if VISUAL_INDEX_SHARED else 0
+
+def sync_visual_index():
+    """
+    Incorpora al índice local las imágenes indexadas por cualquier worker (modo compartido)
+    """
+    global _index_sync_last_id
+    if not VISUAL_INDEX_SHARED:
+        return
+
+    with _index_sync_lock:
+        synced_until = _index_sync_last_id
+        for entry_id, vector, lat, lng, record in shared_state.index_entries(_index_sync_last_id):
+            visual_index.add(vector, lat, lng, record)
+            _index_sync_last_id = entry_id
+        if _index_sync_last_id != synced_until:
+            shared_state.set_index_cursor(_index_sync_last_id)
+
+def persist_shared_index():
+    """
+    Vuelca a disco las imágenes acumuladas por los workers (solo el proceso padre de serve.py)
+    """
+    synced_until = _index_sync_last_id
+    sync_visual_index()
+    if _index_sync_last_id != synced_until:
+        visual_index.save()
+        shared_state.set_meta(INDEX_PERSISTED_META, _index_sync_last_id)
+    # Las entradas que algún worker aún no ha leído se conservan
+    shared_state.clear_index_entries()
+
+def start_shared_index():
+    """
+    Al arrancar serve.py: olvida los cursores de una ejecución anterior y
+    registra el del proceso padre
+    """
+    shared_state.reset_index_cursors()
+    shared_state.set_index_cursor(_index_sync_last_id)
+
+def track_worker(pid):
+    """
+    Registra un worker recién creado con el cursor que hereda del padre, para
+    que no se borren entradas que todavía no ha leído
+    """
+    shared_state.set_index_cursor(_index_sync_last_id, pid)
+
+def forget_worker(pid):
+    shared_state.drop_index_cursor(pid)
+
+def init_worker():
+    """
+    Ajustes de cada worker de serve.py justo después del fork
+    """
+    # Solo el proceso padre escribe el índice en disco
+    visual_index.path = None
+    shared_state.after_fork()
+    shared_state.start_flusher()
+
+def generate_content(content_parts, endpoint=None, started_at=None, lane=None, cancelled=None, **kwargs):
+    """
+    Llama a Gemini dentro de un slot del control de admisión
+    """
+    if has_request_context():
+        endpoint = endpoint or request.path
+        started_at = started_at if started_at is not None else g.get("admission_started")
+        lane = lane or g.get("admission_lane")
+
+    with admission.model_slot(endpoint or "background", started_at, lane or MODEL_LANE, cancelled):
+        shared_state.increment("model_calls")
+        return model.generate_content(content_parts, **kwargs)
+
+# Etapas en las que se agrupan las asignaciones de memoria del informe de perfilado
+profiler.add_stage("pil_decode", path_fragment=os.sep + "PIL" + os.sep)
+profiler.add_stage("base64_encoding", path_fragment=os.sep + "base64.py")
+profiler.add_stage("response_parsing", function=parse_osint_response)
+
+def profiled(view):
+    """
+    Perfila la ruta si la petición lo pide (X-Profile + token) o cae en el muestreo
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        mode = profiler.mode(request.headers, request.args)
+        if not mode:
+            return view(*args, **kwargs)
+
+        result, report = profiler.run(view, *args, **kwargs)
+        if report is None:
+            return result
+
+        response = make_response(result)
+        if mode == "inline" and response.is_json:
+            data = response.get_json()
+            data["profile"] = report
+            response.set_data(json.dumps(data))
+        elif mode == "inline":
+            response.headers["X-Profile-Report"] = json.dumps(report)
+        else:
+            report_id = profiler.store(report, request.path)
+            if report_id:
+                response.headers["X-Profile-Id"] = report_id
+
+        return response
+
+    return wrapper
+
+@app.before_request
+def admission_gate():
+    # Se decide antes de leer la subida: las peticiones rechazadas no ocupan memoria
+    if request.method == "POST" and request.path.startswith("/api/analyze"):
+        g.admission_started, g.admission_lane = admission.admit(request.path, cheap_lane=request.path in MODEL_FREE_ROUTES)
+
+@app.teardown_request
+def admission_release(error=None):
+    if "admission_started" in g:
+        admission.release(request.path, g.admission_started, g.admission_lane)
+        shared_state.increment(f"latency_seconds.{request.path}", time.monotonic() - g.admission_started)
+
+@app.errorhandler(Overloaded)
+def handle_overloaded(error):
+    shared_state.increment(f"rejected.{request.path}")
+    response = jsonify({
+        "error": error.description,
+        "retry_after": error.retry_seconds
+    })
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_seconds)
+    return response
+
+@app.after_request
+def shape_response(response):
+    """
+    Selección de campos (?fields=), modo compacto (?compact=1), MessagePack
+    (Accept: application/x-msgpack o ?format=msgpack) y compresión gzip/brotli
+    """
+    # Solo parámetros de la query: leer el formulario obligaría a consumir la subida
+    if not request.path.startswith("/api/") or response.is_streamed or response.direct_passthrough:
+        return response
+
+    if response.is_json:
+        # Los errores se envían completos: ?fields= quitaría error y retry_after
+        shape = 200 <= response.status_code < 300
+        fields = parse_fields(request.args.get("fields")) if shape else []
+        compact = shape and request.args.get("compact", "").lower() in ("1", "true")
+        wants_msgpack = msgpack is not None and request.args.get("format") == "msgpack"
+        if msgpack is not None and not wants_msgpack:
+            wants_msgpack = request.accept_mimetypes.best_match(["application/json", MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE
+            # El formato depende de Accept (también cuando sale JSON): las cachés deben distinguirlo
+            response.vary.add("Accept")
+
+        if fields or compact or wants_msgpack:
+            mimetype = MSGPACK_MIMETYPE if wants_msgpack else "application/json"
+            response.set_data(encode_payload(shape_payload(response.get_json(), fields, compact), mimetype))
+            response.mimetype = mimetype
+
+    if "Content-Encoding" not in response.headers and response.content_length and response.content_length >= MIN_COMPRESS_BYTES:
+        encoding = request.accept_encodings.best_match(available_encodings())
+        if encoding:
+            response.set_data(compress(response.get_data(), encoding))
+            response.headers["Content-Encoding"] = encoding
+            response.vary.add("Accept-Encoding")
+
+    return response
+
+@app.after_request
+def record_metrics(response):
+    if request.path.startswith("/api/"):
+        shared_state.increment(f"requests.{request.path}")
+        shared_state.increment(f"status.{response.status_code}")
+    return response
+
+@app.route("/api/admission", methods=["GET"])
+def admission_status():
+    return jsonify(admission.snapshot())
+
+@app.route("/api/stats", methods=["GET"])
+def shared_stats():
+    """
+    Métricas agregadas de todos los procesos más el estado de este worker
+    """
+    sync_visual_index()
+    return jsonify({
+        "metrics": shared_state.metrics(),
+        "result_cache_entries": shared_state.cache_size(),
+        "visual_index_size": len(visual_index),
+        "worker": {
+            "pid": os.getpid(),
+            "admission": admission.snapshot()
+        }
+    })
+
+def served_without_model():
+    """
+    La petición se ha resuelto sin el modelo: deja de contar en el cupo del carril del modelo
+    """
+    if "admission_lane" in g:
+        g.admission_lane = admission.mark_model_free(request.path, g.admission_lane)
+
+def cached_response(key):
+    """
+    Respuesta desde la caché compartida de resultados, o None si no hay entrada
+    """
+    cached = shared_state.cache_get(key)
+    if cached is None:
+        shared_state.increment("result_cache.miss")
+        return None
+
+    shared_state.increment("result_cache.hit")
+    served_without_model()
+    response = jsonify(cached)
+    response.headers["X-Result-Cache"] = "hit"
+    return response
+
+def cache_result(key, analysis_data):
+    # Los resultados con error no se guardan: un reintento debe volver a analizar
+    if "error" not in analysis_data:
+        shared_state.cache_put(key, analysis_data)
+
+def run_ensemble_analysis(content_parts, samples):
+    """
+    Self-consistency: lanza varias muestras del modelo en paralelo, agrupa sus
+    coordenadas y devuelve los centroides de los clusters como ubicaciones
+    """
+    endpoint, started_at, lane = request.path, g.get("admission_started"), g.get("admission_lane")
+    agreement = samples // 2 + 1
+
+    # Plazo del ensemble: lo que queda del SLO de la petición
+    deadline = (started_at if started_at is not None else time.monotonic()) + ADMISSION_SLO_SECONDS
+
+    def sample(_, cancelled):
+        response = generate_content(
+            content_parts,
+            endpoint=endpoint,
+            started_at=started_at,
+            lane=lane,
+            cancelled=cancelled,
+            generation_config={"temperature": ENSEMBLE_TEMPERATURE},
+            # Una muestra en curso tras parar el ensemble no retiene su slot más allá del plazo
+            request_options={"timeout": max(1.0, deadline - time.monotonic())}
+        )
+        return parse_osint_response(response.text)
+
+    results, clusters, stopped_early = run_ensemble(
+        sample, samples, ENSEMBLE_MAX_PARALLEL, agreement, ENSEMBLE_RADIUS_KM,
+        timeout=max(0.0, deadline - time.monotonic())
+    )
+
+    if not results:
+        # Agotar el plazo es saturación, no un fallo: 503 con Retry-After como en model_slot
+        raise Overloaded(
+            "Ninguna muestra del ensemble terminó dentro del SLO",
+            admission.snapshot()["model_latency"] or ADMISSION_SLO_SECONDS
+        )
+
+    # La muestra representativa es la que tiene su coordenada primaria en el cluster principal
+    representative = results[0]
+    if clusters:
+        for sample_index in clusters[0]["primary_samples"]:
+            representative = results[sample_index]
+            break
+
+    analysis_data = dict(representative)
+    if clusters:
+        locations = [{"lat": cluster["lat"], "lng": cluster["lng"]} for cluster in clusters[:3]]
+        while len(locations) < 3:
+            locations.append({"lat": None, "lng": None})
+
+        analysis_data["coordinates"] = f"{locations[0]['lat']:.6f}, {locations[0]['lng']:.6f}"
+        analysis_data["detailed_analysis"] = {
+            **representative.get("detailed_analysis", {}),
+            "primary_coordinates": locations[0],
+            "alternative_locations": locations[1:]
+        }
+
+    analysis_data["ensemble"] = {
+        "samples_requested": samples,
+        "samples_completed": len(results),
+        "agreement_required": agreement,
+        "stopped_early": stopped_early,
+        "radius_km": ENSEMBLE_RADIUS_KM,
+        "clusters": clusters[:5]
+    }
+    return analysis_data
+
 @app.route("/", methods=["GET"])
 def home():
     return "GeoSINT v2 Backend API"
     
 @app.route("/api/analyze", methods=["POST"])
+@profiled
 def analyze_image():
     # Verificar si hay imágenes en la petición
     if 'image' not in request.files:
         return jsonify({"error": "No se adjuntó archivo de imagen"}), 400
 
+    try:
+        samples = int(request.values.get("samples", "1"))
+    except ValueError:
+        return jsonify({"error": "El parámetro samples debe ser un número entero"}), 400
+
+    if samples < 1 or samples > ENSEMBLE_MAX_SAMPLES:
+        return jsonify({"error": f"samples debe estar entre 1 y {ENSEMBLE_MAX_SAMPLES}"}), 400
+
     try:
         image_file = request.files['image']
         image_bytes = image_file.read()
+
+        # Caché compartida entre workers: la misma imagen no se vuelve a decodificar ni analizar
+        cache_key = result_key(request.path, [image_bytes], samples=samples)
+        cached = cached_response(cache_key)
+        if cached is not None:
+            return cached
+
         image = Image.open(io.BytesIO(image_bytes))
-        
+
+        # Consultar el índice visual local antes de pagar una llamada a Gemini
+        sync_visual_index()
+        image_features = extract_visual_features(image)
+        visual_matches = visual_index.query(image_features, k=VISUAL_INDEX_TOP_K, min_similarity=VISUAL_INDEX_MIN_SIMILARITY)
+
+        if visual_matches and visual_matches[0]["similarity"] >= VISUAL_INDEX_REUSE_THRESHOLD:
+            served_without_model()
+            return jsonify(build_result_from_visual_matches(visual_matches))
+
         # Prompt profesional de análisis forense OSINT
         prompt_text = """Eres un analista forense de geolocalización OSINT de élite mundial especializado en análisis 360° de ubicaciones. Tu misión es identificar la ubicación EXACTA con precisión militar.
 
@@ -553,13 +1136,30 @@ CRITICAL INSTRUCTIONS:
 
 REMEMBER: Your goal is METER precision, not kilometers. Analyze this image now:"""
         
+        # Las coincidencias del índice visual se envían como pistas previas
+        content_parts = [prompt_text]
+        if visual_matches:
+            content_parts.append(format_visual_priors(visual_matches))
+        content_parts.append(image)
+
+        # Modo ensemble: varias muestras concurrentes agrupadas por distancia
+        if samples > 1:
+            analysis_data = run_ensemble_analysis(content_parts, samples)
+            analysis_data["visual_matches"] = visual_matches
+            index_analysis_result(image_features, analysis_data)
+            cache_result(cache_key, analysis_data)
+            return jsonify(analysis_data)
+
         # Usamos la API de Google Generative AI directamente
-        response = model.generate_content([prompt_text, image])
-        
+        response = generate_content(content_parts)
+
         # Procesamos la respuesta estructurada del análisis forense
         try:
             # Parseamos la respuesta estructurada
             analysis_data = parse_osint_response(response.text)
+            analysis_data["visual_matches"] = visual_matches
+            index_analysis_result(image_features, analysis_data)
+            cache_result(cache_key, analysis_data)
             return jsonify(analysis_data)
         except Exception as parse_error:
             # Si hay error en el parsing, devolvemos la respuesta completa
@@ -573,42 +1173,17 @@ REMEMBER: Your goal is METER precision, not kilometers. Analyze this image now:"
                 "error": str(parse_error)
             })
 
+    except Overloaded:
+        raise
     except Exception as e:
         return jsonify({"error": f"Error en el análisis: {str(e)}"}), 500
 
-@app.route("/api/analyze-multi", methods=["POST"])
-def analyze_multiple_images():
-    if 'images' not in request.files:
-        return jsonify({"error": "No se adjuntaron archivos de imagen"}), 400
-
-    image_files = request.files.getlist('images')
-    
-    if len(image_files) < 2:
-        return jsonify({"error": "Se requieren al menos 2 imágenes para análisis multi-angular"}), 400
-    
-    if len(image_files) > 6:
-        return jsonify({"error": "Máximo 6 imágenes permitidas para análisis multi-angular"}), 400
-
-    try:
-        images = []
-        image_info = []
-        
-        for i, image_file in enumerate(image_files):
-            if image_file.filename != '':
-                image_bytes = image_file.read()
-                image = Image.open(io.BytesIO(image_bytes))
-                images.append(image)
-                image_info.append({
-                    "index": i + 1,
-                    "filename": image_file.filename,
-                    "size": len(image_bytes)
-                })
-        
-        if len(images) < 2:
-            return jsonify({"error": "Se requieren al menos 2 imágenes válidas"}), 400
-        
-        # Prompt especializado para análisis multi-imagen
-        prompt_text = f"""Eres un analista forense de geolocalización OSINT de élite mundial especializado en análisis 360° de ubicaciones. Tu misión es identificar la ubicación EXACTA con precisión militar.
+def run_multi_image_analysis(images, image_info, analysis_type="Multi-Angular OSINT Analysis", context_notes=None):
+    """
+    Ejecuta el análisis multi-angular sobre un conjunto de imágenes ya decodificadas
+    """
+    # Prompt especializado para análisis multi-imagen
+    prompt_text = f"""Eres un analista forense de geolocalización OSINT de élite mundial especializado en análisis 360° de ubicaciones. Tu misión es identificar la ubicación EXACTA con precisión militar.
 
 ANÁLISIS MULTI-ANGULAR AVANZADO:
 Estás analizando {len(images)} imágenes de la MISMA ubicación tomadas desde diferentes ángulos. Estas imágenes representan:
@@ -671,47 +1246,279 @@ Primary Landmark: [Main reference point or building]
 Multi-Image Advantage: [How multiple angles improved accuracy]
 
 REMEMBER: Your goal is METER precision, not kilometers. The multiple images give you SIGNIFICANT advantage for triangulation. Use this to provide the MOST ACCURATE coordinates possible. Analyze these {len(images)} images now:"""
+    
+    # Preparamos el contenido para la API (texto + vista general y recortes de texto por imagen)
+    if SIGNAGE_CROPS_ENABLED and VISION_API_URL:
+        text_annotations = detect_text_with_google_vision(images)
+    else:
+        text_annotations = [[] for _ in images]
+
+    image_parts = []
+    for i, image in enumerate(images):
+        parts, crop_count = signage_content_parts(image, text_annotations[i], f"Image {i + 1}")
+        image_parts += parts
+        image_info[i]["signage_crops"] = crop_count
+
+    # La nota sobre los recortes solo tiene sentido si se envió alguno
+    has_crops = any(info["signage_crops"] for info in image_info)
+    content_parts = [prompt_text] + ([SIGNAGE_CROPS_NOTE] if has_crops else []) + (context_notes or []) + image_parts
+    
+    # Usamos la API de Google Generative AI directamente
+    response = generate_content(content_parts)
+    
+    # Procesamos la respuesta estructurada del análisis forense
+    try:
+        # Parseamos la respuesta estructurada
+        analysis_data = parse_osint_response(response.text)
         
-        # Preparamos el contenido para la API (texto + imágenes)
-        content_parts = [prompt_text] + images
-        
-        # Usamos la API de Google Generative AI directamente
-        response = model.generate_content(content_parts)
+        # Agregamos información sobre el análisis multi-imagen
+        analysis_data["multi_image_analysis"] = {
+            "total_images": len(images),
+            "image_info": image_info,
+            "analysis_type": analysis_type
+        }
         
-        # Procesamos la respuesta estructurada del análisis forense
-        try:
-            # Parseamos la respuesta estructurada
-            analysis_data = parse_osint_response(response.text)
-            
-            # Agregamos información sobre el análisis multi-imagen
-            analysis_data["multi_image_analysis"] = {
+        return analysis_data
+    except Exception as parse_error:
+        # Si hay error en el parsing, devolvemos la respuesta completa
+        return {
+            "country": "Analysis Error",
+            "region_or_city": "Could not parse response", 
+            "coordinates": "N/A",
+            "confidence": "Low",
+            "reasoning": response.text,
+            "raw_response": response.text,
+            "error": str(parse_error),
+            "multi_image_analysis": {
                 "total_images": len(images),
                 "image_info": image_info,
-                "analysis_type": "Multi-Angular OSINT Analysis"
+                "analysis_type": analysis_type
             }
-            
-            return jsonify(analysis_data)
-        except Exception as parse_error:
-            # Si hay error en el parsing, devolvemos la respuesta completa
-            return jsonify({
-                "country": "Analysis Error",
-                "region_or_city": "Could not parse response", 
-                "coordinates": "N/A",
-                "confidence": "Low",
-                "reasoning": response.text,
-                "raw_response": response.text,
-                "error": str(parse_error),
-                "multi_image_analysis": {
-                    "total_images": len(images),
-                    "image_info": image_info,
-                    "analysis_type": "Multi-Angular OSINT Analysis"
-                }
-            })
+        }
+
+@app.route("/api/analyze-multi", methods=["POST"])
+@profiled
+def analyze_multiple_images():
+    if 'images' not in request.files:
+        return jsonify({"error": "No se adjuntaron archivos de imagen"}), 400
+
+    image_files = request.files.getlist('images')
+    
+    if len(image_files) < 2:
+        return jsonify({"error": "Se requieren al menos 2 imágenes para análisis multi-angular"}), 400
+    
+    if len(image_files) > 6:
+        return jsonify({"error": "Máximo 6 imágenes permitidas para análisis multi-angular"}), 400
+
+    try:
+        images = []
+        images_bytes = []
+        image_info = []
+        
+        for i, image_file in enumerate(image_files):
+            if image_file.filename != '':
+                image_bytes = image_file.read()
+                image = Image.open(io.BytesIO(image_bytes))
+                images.append(image)
+                images_bytes.append(image_bytes)
+                image_info.append({
+                    "index": i + 1,
+                    "filename": image_file.filename,
+                    "size": len(image_bytes)
+                })
+        
+        if len(images) < 2:
+            return jsonify({"error": "Se requieren al menos 2 imágenes válidas"}), 400
 
+        cache_key = result_key(request.path, images_bytes)
+        cached = cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+        analysis_data = run_multi_image_analysis(images, image_info)
+        cache_result(cache_key, analysis_data)
+        return jsonify(analysis_data)
+
+    except Overloaded:
+        raise
     except Exception as e:
         return jsonify({"error": f"Error en el análisis multi-imagen: {str(e)}"}), 500
 
+@app.route("/api/analyze-burst", methods=["POST"])
+@profiled
+def analyze_burst():
+    """
+    Análisis multi-angular a partir de un clip animado (GIF, WebP, APNG, TIFF)
+    o una ráfaga de fotos: solo los fotogramas clave distintos llegan al modelo
+    """
+    if 'media' not in request.files:
+        return jsonify({"error": "No se adjuntó ningún clip o ráfaga de imágenes"}), 400
+
+    media_files = [media_file for media_file in request.files.getlist('media') if media_file.filename != '']
+
+    if not media_files:
+        return jsonify({"error": "No se adjuntó ningún clip o ráfaga de imágenes"}), 400
+
+    if len(media_files) > BURST_MAX_FILES:
+        return jsonify({"error": f"Máximo {BURST_MAX_FILES} archivos por ráfaga"}), 400
+
+    try:
+        # Los fotogramas se decodifican en streaming directamente desde los archivos subidos
+        try:
+            keyframes, selection_stats = select_keyframes(
+                [media_file.stream for media_file in media_files],
+                budget=BURST_KEYFRAME_BUDGET,
+                max_frames=BURST_MAX_FRAMES
+            )
+        except Exception as decode_error:
+            return jsonify({"error": f"No se pudieron decodificar los fotogramas: {str(decode_error)}"}), 400
+
+        if not keyframes:
+            return jsonify({"error": "No se encontraron fotogramas válidos"}), 400
+
+        images = [keyframe["image"] for keyframe in keyframes]
+        image_info = [{
+            "index": i + 1,
+            "filename": media_files[keyframe["file_index"]].filename,
+            "frame": keyframe["frame_index"],
+            "sharpness": round(keyframe["sharpness"], 4),
+            "novelty": keyframe["novelty"]
+        } for i, keyframe in enumerate(keyframes)]
+
+        # Un clip estático deja una sola escena: el modelo no debe buscar ángulos que no existen
+        context_notes = None
+        if len(images) == 1:
+            context_notes = ["NOTA: el clip solo contiene una escena distinta. Analiza esta única imagen y omite la correlación entre ángulos."]
+
+        analysis_data = run_multi_image_analysis(
+            images, image_info, analysis_type="Burst Keyframe OSINT Analysis", context_notes=context_notes
+        )
+        analysis_data["keyframe_selection"] = {
+            **selection_stats,
+            "keyframes_selected": len(keyframes),
+            "budget": BURST_KEYFRAME_BUDGET
+        }
+
+        return jsonify(analysis_data)
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Error en el análisis de ráfaga: {str(e)}"}), 500
+
+def live_session_handler(ws):
+    """
+    Sesión de geolocalización en vivo: recibe fotogramas (binario o JSON con
+    base64), descarta duplicados y empuja resultados refinados al cliente
+    """
+    def analyze_frames(images, context_notes):
+        # La sesión es larga: cada consulta al modelo pasa por la admisión como
+        # un análisis más, así cuenta en el cupo de análisis en curso
+        g.admission_started, g.admission_lane = admission.admit(request.path, cheap_lane=False)
+        try:
+            image_info = [{"index": i + 1, "filename": "live-frame"} for i in range(len(images))]
+            return run_multi_image_analysis(images, image_info, analysis_type="Live Session OSINT Analysis", context_notes=context_notes)
+        finally:
+            admission.release(request.path, g.pop("admission_started"), g.pop("admission_lane"))
+
+    session = LiveSession(analyze_frames, LIVE_MAX_KEYFRAMES, LIVE_REQUERY_NEW_FRAMES, LIVE_MIN_REQUERY_SECONDS)
+    ws.send(json.dumps({
+        "type": "ready",
+        "max_keyframes": LIVE_MAX_KEYFRAMES,
+        "max_frame_bytes": LIVE_MAX_FRAME_BYTES
+    }))
+
+    while True:
+        message = ws.receive()
+        if message is None:
+            break
+
+        if isinstance(message, str):
+            try:
+                command = json.loads(message)
+            except ValueError:
+                ws.send(json.dumps({"type": "error", "error": "Mensaje no válido"}))
+                continue
+
+            if command.get("type") == "close":
+                ws.send(json.dumps({"type": "closed", "stats": session.stats()}))
+                break
+            if command.get("type") == "reset":
+                session.reset()
+                ws.send(json.dumps({"type": "reset"}))
+                continue
+            if command.get("type") != "frame" or not command.get("data"):
+                ws.send(json.dumps({"type": "error", "error": "Tipo de mensaje desconocido"}))
+                continue
+            try:
+                frame_bytes = base64.b64decode(command["data"])
+            except ValueError:
+                ws.send(json.dumps({"type": "error", "error": "Fotograma base64 no válido"}))
+                continue
+        else:
+            frame_bytes = message
+
+        if len(frame_bytes) > LIVE_MAX_FRAME_BYTES:
+            ws.send(json.dumps({"type": "error", "error": f"Fotograma mayor de {LIVE_MAX_FRAME_BYTES} bytes"}))
+            continue
+
+        try:
+            image = Image.open(io.BytesIO(frame_bytes))
+            image.load()
+        except Exception as e:
+            ws.send(json.dumps({"type": "error", "error": f"No se pudo decodificar el fotograma: {str(e)}"}))
+            continue
+
+        try:
+            event = session.add_frame(image)
+        except Overloaded as e:
+            event = {"type": "error", "error": e.description, "retry_after": e.retry_seconds}
+        except Exception as e:
+            event = {"type": "error", "error": f"Error en el análisis en vivo: {str(e)}"}
+
+        ws.send(json.dumps(event))
+
+if sock:
+    sock.route("/api/live")(live_session_handler)
+
+# Formatos de exportación: generador, tipo MIME y extensión del archivo
+EXPORT_FORMATS = {
+    "geojson": (geojson_stream, "application/geo+json", "geojson"),
+    "kml": (kml_stream, "application/vnd.google-earth.kml+xml", "kml")
+}
+
+@app.route("/api/export/<export_format>", methods=["GET", "POST"])
+def export_results(export_format):
+    """
+    Exporta resultados a GeoJSON o KML en streaming. GET exporta los análisis
+    guardados en el índice visual; POST exporta un lote enviado por el cliente
+    (JSON o NDJSON con un resultado por línea)
+    """
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Formato no soportado: {export_format}. Usa geojson o kml"}), 404
+
+    writer, mimetype, extension = EXPORT_FORMATS[export_format]
+
+    if request.method == "GET":
+        sync_visual_index()
+        results = visual_index.records()
+    elif request.mimetype == "application/x-ndjson":
+        # El lote se lee línea a línea mientras se escribe la respuesta
+        results = iter_ndjson(io.BufferedReader(request.stream, buffer_size=64 * 1024))
+    else:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get("results", [payload])
+        if not isinstance(payload, list):
+            return jsonify({"error": "Se esperaba una lista de resultados (JSON) o NDJSON"}), 400
+        results = payload
+
+    response = Response(stream_with_context(writer(results)), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="geosint-export.{extension}"'
+    return response
+
 @app.route("/api/analyze-lens", methods=["POST"])
+@profiled
 def analyze_with_google_lens():
     """
     Análisis tipo Google Lens usando Google Cloud Vision API
@@ -723,6 +1530,8 @@ def analyze_with_google_lens():
         image_file = request.files['image']
         image_bytes = image_file.read()
         
+        vision_results = None
+
         # Paso 1: Intentar usar Google Cloud Vision API
         if GOOGLE_CLOUD_API_KEY:
             vision_results = analyze_image_with_google_vision(image_bytes)
@@ -734,22 +1543,39 @@ def analyze_with_google_lens():
                 if location_clues:
                     # Usar la primera pista como ubicación principal
                     primary_clue = location_clues[0]
+
+                    # Coordenadas: lugares resueltos por el gazetteer, o geocodificación de la pista principal
+                    located_clues = [clue for clue in location_clues if clue.get("lat") is not None]
+                    country_only = False
+                    if not located_clues:
+                        country_only = primary_clue.get("kind") == "country"
+                        geocoded = geocode_with_google_maps(primary_clue["text"])
+                        if geocoded:
+                            located_clues = [{**primary_clue, "lat": geocoded["lat"], "lng": geocoded["lng"]}]
+
+                    coordinates = [{"lat": clue["lat"], "lng": clue["lng"]} for clue in located_clues[:3]]
+                    while len(coordinates) < 3:
+                        coordinates.append({"lat": None, "lng": None})
+                    primary_coordinates = coordinates[0]
+
+                    # Resuelto solo con Vision: deja de contar en el cupo del modelo
+                    served_without_model()
+
+                    # Un punto obtenido solo a partir del nombre del país no justifica confianza alta
+                    if country_only:
+                        confidence = "Low"
+                    else:
+                        confidence = "High" if primary_clue["score"] > 0.7 else "Medium"
                     
                     return jsonify({
-                        "country": "Detected via Google Vision",
+                        "country": primary_clue.get("country", "Detected via Google Vision"),
                         "region_or_city": primary_clue["text"],
-                        "coordinates": "40.123456, -74.123456",  # Coordenadas de ejemplo
-                        "confidence": "High" if primary_clue["score"] > 0.7 else "Medium",
+                        "coordinates": f"{primary_coordinates['lat']:.6f}, {primary_coordinates['lng']:.6f}" if primary_coordinates["lat"] is not None else "N/A",
+                        "confidence": confidence,
                         "reasoning": f"Location identified through Google Cloud Vision API. Found {len(location_clues)} visual clues from web sources.",
                         "detailed_analysis": {
-                            "primary_coordinates": {
-                                "lat": 40.123456,
-                                "lng": -74.123456
-                            },
-                            "alternative_locations": [
-                                {"lat": 40.123456, "lng": -74.123456},
-                                {"lat": 40.123456, "lng": -74.123456}
-                            ],
+                            "primary_coordinates": primary_coordinates,
+                            "alternative_locations": coordinates[1:3],
                             "evidence": {
                                 "signage": f"Web entity: {primary_clue['text']}",
                                 "infrastructure": f"Source: {primary_clue['source']}",
@@ -808,17 +1634,24 @@ Primary Landmark: [Main reference point or building]
 
 Analyze this image now:"""
         
-        response = model.generate_content([prompt_text, image])
+        # Reutilizamos las regiones de texto que ya devolvió Vision (si hubo llamada)
+        text_annotations = vision_results.get("text_annotations", []) if vision_results and "error" not in vision_results else []
+        parts, crop_count = signage_content_parts(image, text_annotations, "Image")
+
+        response = generate_content([prompt_text] + ([SIGNAGE_CROPS_NOTE] if crop_count else []) + parts)
         analysis_data = parse_osint_response(response.text)
         
         # Agregar información de Google Lens
         analysis_data["google_lens_analysis"] = {
             "analysis_type": "Simulated Google Lens (Vision API fallback)",
-            "method": "AI-powered visual analysis"
+            "method": "AI-powered visual analysis",
+            "signage_crops": crop_count
         }
         
         return jsonify(analysis_data)
         
+    except Overloaded:
+        raise
     except Exception as e:
         return jsonify({
             "error": f"Error en el análisis Google Lens: {str(e)}",
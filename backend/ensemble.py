@@ -0,0 +1,134 @@
+# /backend/ensemble.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from geo import pairwise_haversine_km
+
+# Peso de cada coordenada de una muestra al agrupar
+PRIMARY_WEIGHT = 1.0
+ALTERNATIVE_WEIGHT = 0.35
+
+
+def sample_points(samples):
+    """
+    Extrae (lat, lng, peso, índice de muestra, es_primaria) de las muestras parseadas
+    """
+    points = []
+    for sample_index, sample in enumerate(samples):
+        details = sample.get("detailed_analysis", {})
+        locations = [(details.get("primary_coordinates", {}), PRIMARY_WEIGHT, True)]
+        locations += [(location, ALTERNATIVE_WEIGHT, False) for location in details.get("alternative_locations", [])]
+
+        for location, weight, is_primary in locations:
+            if location.get("lat") is None or location.get("lng") is None:
+                continue
+            points.append((location["lat"], location["lng"], weight, sample_index, is_primary))
+    return points
+
+
+def _centroid(lats, lngs, weights):
+    """
+    Centroide ponderado sobre la esfera (media de vectores unitarios)
+    """
+    lat_rad, lng_rad = np.radians(lats), np.radians(lngs)
+    xyz = np.stack([np.cos(lat_rad) * np.cos(lng_rad), np.cos(lat_rad) * np.sin(lng_rad), np.sin(lat_rad)], axis=1)
+    mean = (xyz * weights[:, None]).sum(axis=0)
+    mean /= np.linalg.norm(mean) or 1.0
+    return float(np.degrees(np.arcsin(mean[2]))), float(np.degrees(np.arctan2(mean[1], mean[0])))
+
+
+def cluster_coordinates(points, radius_km):
+    """
+    Agrupa coordenadas con una matriz de distancias haversine vectorizada.
+
+    En cada paso se elige el punto con más peso a su alrededor (dentro de
+    `radius_km`), se forma un cluster con sus vecinos libres y se repite.
+    """
+    if not points:
+        return []
+
+    lats = np.array([point[0] for point in points], dtype=np.float64)
+    lngs = np.array([point[1] for point in points], dtype=np.float64)
+    weights = np.array([point[2] for point in points], dtype=np.float64)
+    sample_ids = np.array([point[3] for point in points])
+    primary = np.array([point[4] for point in points])
+
+    neighbours = pairwise_haversine_km(lats, lngs) <= radius_km
+    free = np.ones(len(points), dtype=bool)
+
+    clusters = []
+    while free.any():
+        density = (neighbours[:, free] * weights[free]).sum(axis=1)
+        density[~free] = -1
+        seed = int(np.argmax(density))
+
+        members = neighbours[seed] & free
+        free &= ~members
+
+        lat, lng = _centroid(lats[members], lngs[members], weights[members])
+        clusters.append({
+            "lat": round(lat, 6),
+            "lng": round(lng, 6),
+            "support": round(float(weights[members].sum()), 3),
+            "samples": sorted({int(sample_id) for sample_id in sample_ids[members]}),
+            "primary_samples": sorted({int(sample_id) for sample_id in sample_ids[members & primary]})
+        })
+
+    clusters.sort(key=lambda cluster: cluster["support"], reverse=True)
+    return clusters
+
+
+def run_ensemble(sample_function, samples, max_parallel, agreement, radius_km, timeout=None):
+    """
+    Lanza `samples` llamadas concurrentes (como mucho `max_parallel` a la vez)
+    y deja de lanzar y de esperar en cuanto un cluster reúne `agreement`
+    coordenadas primarias de muestras distintas, o al agotarse `timeout`
+    segundos para el ensemble completo.
+
+    `sample_function(índice, cancelado)` recibe un threading.Event que se
+    activa al terminar el ensemble: las muestras que aún esperan un slot del
+    modelo deben abandonarlo en lugar de ocuparlo para nada.
+
+    Devuelve (muestras parseadas, clusters, se_detuvo_antes).
+    """
+    results = []
+    errors = []
+    clusters = []
+    stopped_early = False
+    cancelled = threading.Event()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_parallel, samples)))
+    try:
+        pending = {executor.submit(sample_function, index, cancelled) for index in range(samples)}
+
+        while pending:
+            # Un único plazo para todo el ensemble, no uno por cada espera
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+
+            for future in done:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # Una muestra fallida no invalida el resto
+                    errors.append(e)
+
+            clusters = cluster_coordinates(sample_points(results), radius_km)
+            if any(len(cluster["primary_samples"]) >= agreement for cluster in clusters):
+                stopped_early = bool(pending)
+                break
+    finally:
+        # Las muestras no lanzadas se cancelan, las que esperan slot lo abandonan
+        # y las que ya llaman al modelo no se esperan
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not results and errors:
+        raise errors[0]
+
+    return results, clusters, stopped_early
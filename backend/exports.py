@@ -0,0 +1,150 @@
+# /backend/exports.py
+
+import json
+from xml.sax.saxutils import escape
+
+EVIDENCE_FIELDS = ("signage", "infrastructure", "architecture", "environment", "cultural_elements")
+
+# Número de features que se agrupan en cada trozo enviado al cliente
+CHUNK_FEATURES = 200
+
+
+def result_points(result):
+    """
+    Convierte un resultado de análisis (formato parse_osint_response o registro
+    del índice visual) en puntos (rol, lat, lng)
+    """
+    details = result.get("detailed_analysis")
+    if isinstance(details, dict):
+        locations = [("primary", details.get("primary_coordinates") or {})]
+        locations += [
+            (f"alternative_{i + 1}", location or {})
+            for i, location in enumerate(details.get("alternative_locations") or [])
+        ]
+    else:
+        locations = [("primary", result)]
+
+    for role, location in locations:
+        lat, lng = location.get("lat"), location.get("lng")
+        if lat is None or lng is None:
+            continue
+        try:
+            yield role, float(lat), float(lng)
+        except (TypeError, ValueError):
+            continue
+
+
+def result_properties(result, analysis_id, role):
+    """
+    Propiedades de un punto exportado: ubicación, confianza y evidencia
+    """
+    details = result.get("detailed_analysis") if isinstance(result.get("detailed_analysis"), dict) else {}
+    assessment = details.get("final_assessment") or {}
+    evidence = details.get("evidence") or {}
+
+    properties = {
+        "analysis_id": analysis_id,
+        "role": role,
+        "country": result.get("country"),
+        "region_or_city": result.get("region_or_city"),
+        "confidence": result.get("confidence"),
+        "certainty_percentage": assessment.get("certainty_percentage"),
+        "most_probable_location": assessment.get("most_probable_location", result.get("most_probable_location")),
+        "primary_landmark": assessment.get("primary_landmark")
+    }
+    for field in EVIDENCE_FIELDS:
+        if evidence.get(field):
+            properties[field] = evidence[field]
+
+    return {key: value for key, value in properties.items() if value is not None}
+
+
+def _features(results):
+    for analysis_id, result in enumerate(results):
+        if not isinstance(result, dict):
+            continue
+        for role, lat, lng in result_points(result):
+            yield lat, lng, result_properties(result, analysis_id, role)
+
+
+def geojson_stream(results):
+    """
+    Genera una FeatureCollection GeoJSON de forma incremental (memoria constante)
+    """
+    yield '{"type":"FeatureCollection","features":['
+
+    chunk = []
+    first = True
+    for lat, lng, properties in _features(results):
+        feature = json.dumps({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lng, lat]},
+            "properties": properties
+        }, ensure_ascii=False, separators=(",", ":"))
+        chunk.append(feature if first else "," + feature)
+        first = False
+
+        if len(chunk) >= CHUNK_FEATURES:
+            yield "".join(chunk)
+            chunk = []
+
+    if chunk:
+        yield "".join(chunk)
+    yield "]}"
+
+
+def kml_stream(results, name="GeoSINT export"):
+    """
+    Genera un documento KML de forma incremental, con estilos distintos para
+    ubicaciones primarias y alternativas
+    """
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>'
+        f'<name>{escape(name)}</name>'
+        '<Style id="primary"><IconStyle><color>ff0000ff</color><scale>1.1</scale></IconStyle></Style>'
+        '<Style id="alternative"><IconStyle><color>ff00a5ff</color><scale>0.8</scale></IconStyle></Style>'
+    )
+
+    chunk = []
+    for lat, lng, properties in _features(results):
+        title = properties.get("region_or_city") or properties.get("country") or "Unknown"
+        description = "\n".join(
+            f"{field}: {properties[field]}" for field in EVIDENCE_FIELDS if field in properties
+        )
+        extended = "".join(
+            f'<Data name="{escape(key)}"><value>{escape(str(value))}</value></Data>'
+            for key, value in properties.items()
+        )
+        style = "primary" if properties["role"] == "primary" else "alternative"
+        placemark_name = f"{title} ({properties['role']})"
+
+        chunk.append(
+            f'<Placemark><name>{escape(placemark_name)}</name>'
+            f'<description>{escape(description)}</description>'
+            f'<styleUrl>#{style}</styleUrl>'
+            f'<ExtendedData>{extended}</ExtendedData>'
+            f'<Point><coordinates>{lng:.6f},{lat:.6f}</coordinates></Point></Placemark>'
+        )
+
+        if len(chunk) >= CHUNK_FEATURES:
+            yield "".join(chunk)
+            chunk = []
+
+    if chunk:
+        yield "".join(chunk)
+    yield "</Document></kml>\n"
+
+
+def iter_ndjson(stream):
+    """
+    Lee resultados en formato NDJSON línea a línea desde un stream
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
@@ -0,0 +1,243 @@
+# /backend/gazetteer.py
+
+import os
+import unicodedata
+from collections import deque
+
+# Peso de cada fuente de texto al puntuar una mención
+SOURCE_WEIGHTS = {
+    "landmark": 0.95,
+    "web_entity": 0.8,
+    "detected_text": 0.7,
+    "page_title": 0.6
+}
+
+# Los lugares más específicos son más útiles para geolocalizar
+KIND_WEIGHTS = {
+    "landmark": 1.0,
+    "city": 0.9,
+    "region": 0.8,
+    "country": 0.6
+}
+
+# Clases de entidad de GeoNames que se aceptan al cargar un volcado completo
+GEONAMES_FEATURE_KINDS = {
+    "P": "city",
+    "A": "region",
+    "S": "landmark",
+    "T": "landmark",
+    "L": "landmark",
+    "H": "landmark"
+}
+
+
+def normalize_text(text):
+    """
+    Pasa a minúsculas y elimina acentos para comparar nombres de lugares
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class Gazetteer:
+    """
+    Autómata Aho-Corasick sobre una lista local de nombres de lugares.
+
+    Encuentra todas las menciones de ciudades, países y landmarks de un texto
+    en una sola pasada lineal, sin llamadas a APIs externas.
+    """
+
+    def __init__(self, places):
+        self.places = list(places)
+
+        # Tablas del autómata: transiciones, enlaces de fallo y salidas por estado
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._names = {}
+
+        for place_id, place in enumerate(self.places):
+            keys = {normalize_text(name).strip() for name in [place["name"]] + place.get("aliases", [])}
+            for key in keys:
+                if len(key) < 2:
+                    continue
+                self._names.setdefault(key, []).append(place_id)
+                self._insert(key, place_id)
+
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self.places)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Carga la lista de lugares desde un TSV propio o un volcado de GeoNames
+        """
+        places = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                columns = line.rstrip("\n").split("\t")
+
+                if len(columns) >= 19:
+                    # Formato GeoNames (cities15000.txt, allCountries.txt, ...)
+                    kind = GEONAMES_FEATURE_KINDS.get(columns[6])
+                    if not kind:
+                        continue
+                    places.append({
+                        "name": columns[1],
+                        "kind": kind,
+                        "country": columns[8],
+                        "lat": float(columns[4]),
+                        "lng": float(columns[5]),
+                        "aliases": [columns[2]] if columns[2] and columns[2] != columns[1] else []
+                    })
+                else:
+                    # Formato propio: name, kind, country, lat, lng, aliases
+                    columns += [""] * (6 - len(columns))
+                    places.append({
+                        "name": columns[0],
+                        "kind": columns[1] or "city",
+                        "country": columns[2],
+                        "lat": float(columns[3]),
+                        "lng": float(columns[4]),
+                        "aliases": [alias for alias in columns[5].split("|") if alias]
+                    })
+
+        return cls(places)
+
+    def _insert(self, key, place_id):
+        state = 0
+        for char in key:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append((len(key), place_id))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+
+                # Las salidas del estado de fallo también terminan aquí
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """
+        Devuelve las menciones (inicio, fin, place_id) sin solapamientos,
+        priorizando el nombre más largo (ej. "New York City" frente a "York")
+        """
+        normalized = normalize_text(text)
+        goto, fail, output = self._goto, self._fail, self._output
+
+        matches = []
+        state = 0
+        for end, char in enumerate(normalized, start=1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for length, place_id in output[state]:
+                start = end - length
+                # Solo palabras completas
+                if start > 0 and normalized[start - 1].isalnum():
+                    continue
+                if end < len(normalized) and normalized[end].isalnum():
+                    continue
+                matches.append((start, end, place_id))
+
+        matches.sort(key=lambda match: (match[0], match[0] - match[1]))
+
+        selected = []
+        last_end = -1
+        for start, end, place_id in matches:
+            if start >= last_end:
+                selected.append((start, end, place_id))
+                last_end = end
+            elif selected and (start, end) == selected[-1][:2]:
+                # Mismo nombre para varios lugares (ej. ciudad-estado y país)
+                selected.append((start, end, place_id))
+
+        return selected
+
+    def lookup(self, name):
+        """
+        Busca un lugar cuyo nombre o alias coincida exactamente con `name`
+        """
+        place_ids = self._names.get(normalize_text(name).strip())
+        if not place_ids:
+            return None
+        return self.places[min(place_ids, key=lambda place_id: -KIND_WEIGHTS.get(self.places[place_id]["kind"], 0.5))]
+
+    def extract_candidates(self, texts, limit=5):
+        """
+        Extrae y puntúa candidatos de ubicación a partir de textos etiquetados
+        por fuente: [(source, text, score), ...]
+
+        Cada mención aporta peso_fuente * score; las menciones repetidas se
+        combinan como evidencia independiente (1 - prod(1 - w)).
+        """
+        evidence = {}
+        for source, text, score in texts:
+            if not text:
+                continue
+            weight = SOURCE_WEIGHTS.get(source, 0.5) * (score if score is not None else 1.0)
+            for _, _, place_id in self.find(text):
+                entry = evidence.setdefault(place_id, {"miss": 1.0, "mentions": 0, "sources": set()})
+                entry["miss"] *= 1.0 - min(weight, 0.99)
+                entry["mentions"] += 1
+                entry["sources"].add(source)
+
+        mentioned_countries = {
+            normalize_text(self.places[place_id]["country"])
+            for place_id in evidence
+            if self.places[place_id]["kind"] == "country"
+        }
+
+        candidates = []
+        for place_id, entry in evidence.items():
+            place = self.places[place_id]
+            confidence = (1.0 - entry["miss"]) * KIND_WEIGHTS.get(place["kind"], 0.5)
+
+            # Una ciudad o landmark respaldada por la mención de su país es más fiable
+            if place["kind"] != "country" and normalize_text(place["country"]) in mentioned_countries:
+                confidence = min(confidence + 0.1, 0.99)
+
+            candidates.append({
+                "location": place["name"],
+                "kind": place["kind"],
+                "country": place["country"],
+                "lat": place["lat"],
+                "lng": place["lng"],
+                "confidence": round(confidence, 4),
+                "mentions": entry["mentions"],
+                "sources": sorted(entry["sources"])
+            })
+
+        candidates.sort(key=lambda candidate: candidate["confidence"], reverse=True)
+        return candidates[:limit]
+
+
+def load_gazetteer(path):
+    """
+    Carga el gazetteer local; devuelve uno vacío si el archivo no existe
+    """
+    if not path or not os.path.exists(path):
+        print(f"⚠️  Lista de lugares no encontrada en {path} - gazetteer vacío")
+        return Gazetteer([])
+    return Gazetteer.from_file(path)
@@ -0,0 +1,131 @@
+# /backend/keyframes.py
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+# Tamaño de la firma en escala de grises usada para comparar fotogramas
+SIGNATURE_SIZE = 32
+
+# Diferencia media absoluta (0-1) a partir de la cual hay un cambio de escena
+SCENE_CHANGE_THRESHOLD = 0.10
+
+# Por debajo de esta diferencia dos fotogramas se consideran casi duplicados
+DUPLICATE_THRESHOLD = 0.06
+
+# Candidatos retenidos en memoria mientras se decodifica (múltiplo del presupuesto final)
+CANDIDATE_POOL_FACTOR = 2
+
+
+def frame_signature(frame):
+    """
+    Reduce un fotograma a una firma en grises de 32x32 (valores entre 0 y 1)
+    y devuelve también su nitidez (energía del gradiente)
+    """
+    small = frame.convert("L").resize((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    pixels = np.asarray(small, dtype=np.float32) / 255.0
+
+    sharpness = float(np.abs(np.diff(pixels, axis=0)).mean() + np.abs(np.diff(pixels, axis=1)).mean())
+
+    return pixels, sharpness
+
+
+def frame_difference(a, b):
+    """
+    Diferencia media absoluta entre dos firmas (0 = idénticas)
+    """
+    return float(np.abs(a - b).mean())
+
+
+def iter_frames(files, max_frames):
+    """
+    Decodifica en streaming los fotogramas de formatos animados (GIF, WebP, APNG,
+    TIFF multipágina) o de una secuencia de imágenes sueltas
+    """
+    decoded = 0
+    for file_index, file in enumerate(files):
+        container = Image.open(file)
+        for frame_index, frame in enumerate(ImageSequence.Iterator(container)):
+            if decoded >= max_frames:
+                return
+            decoded += 1
+            yield file_index, frame_index, frame
+
+
+def select_keyframes(files, budget=6, max_frames=600):
+    """
+    Selecciona hasta `budget` fotogramas informativos y distintos entre sí.
+
+    Los fotogramas se agrupan en escenas por diferencia con el primero de la
+    escena (así un barrido lento también acaba abriendo escenas nuevas); de cada
+    escena se conserva el más nítido y se descartan los casi duplicados de
+    escenas ya retenidas. Solo se mantienen en memoria unos pocos candidatos.
+    """
+    pool_size = budget * CANDIDATE_POOL_FACTOR
+    pool = []
+    stats = {"frames_decoded": 0, "scenes": 0, "duplicates_skipped": 0}
+
+    segment_best = None
+    anchor_signature = None
+
+    def flush(candidate):
+        if candidate is None:
+            return
+        stats["scenes"] += 1
+
+        if any(frame_difference(candidate["signature"], kept["signature"]) < DUPLICATE_THRESHOLD for kept in pool):
+            stats["duplicates_skipped"] += 1
+            return
+
+        pool.append(candidate)
+        if len(pool) > pool_size:
+            pool.pop(most_redundant(pool))
+
+    for file_index, frame_index, frame in iter_frames(files, max_frames):
+        stats["frames_decoded"] += 1
+        signature, sharpness = frame_signature(frame)
+
+        if anchor_signature is not None and frame_difference(signature, anchor_signature) >= SCENE_CHANGE_THRESHOLD:
+            flush(segment_best)
+            segment_best = None
+            anchor_signature = None
+        if anchor_signature is None:
+            anchor_signature = signature
+
+        if segment_best is None or sharpness > segment_best["sharpness"]:
+            # Solo el mejor fotograma de la escena actual se copia a memoria
+            segment_best = {
+                "image": frame.convert("RGB"),
+                "signature": signature,
+                "sharpness": sharpness,
+                "file_index": file_index,
+                "frame_index": frame_index
+            }
+
+    flush(segment_best)
+
+    while len(pool) > budget:
+        pool.pop(most_redundant(pool))
+
+    # Mantener el orden temporal original
+    pool.sort(key=lambda candidate: (candidate["file_index"], candidate["frame_index"]))
+
+    for candidate in pool:
+        others = [frame_difference(candidate["signature"], other["signature"]) for other in pool if other is not candidate]
+        candidate["novelty"] = round(min(others), 4) if others else 1.0
+
+    return pool, stats
+
+
+def most_redundant(pool):
+    """
+    Índice del candidato más parecido al resto (menor distancia al vecino más
+    cercano), desempatando por menor nitidez. Se devuelve el índice para
+    quitarlo con pop(): list.remove() compararía los diccionarios, imágenes incluidas
+    """
+    signatures = np.stack([candidate["signature"].ravel() for candidate in pool])
+    distances = np.abs(signatures[:, None, :] - signatures[None, :, :]).mean(axis=2)
+    np.fill_diagonal(distances, np.inf)
+    nearest = distances.min(axis=1)
+
+    order = np.lexsort(([candidate["sharpness"] for candidate in pool], nearest))
+    return int(order[0])
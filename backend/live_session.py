@@ -0,0 +1,207 @@
+# /backend/live_session.py
+
+import time
+import numpy as np
+from keyframes import DUPLICATE_THRESHOLD, SCENE_CHANGE_THRESHOLD, frame_signature, frame_difference, most_redundant
+from geo import haversine_km
+
+# Radio (km) dentro del cual dos coordenadas candidatas se consideran la misma
+CANDIDATE_MERGE_RADIUS_KM = 2.0
+
+# Peso de cada coordenada de una respuesta del modelo al acumular candidatos
+PRIMARY_WEIGHT = 1.0
+ALTERNATIVE_WEIGHT = 0.4
+
+EVIDENCE_FIELDS = ("signage", "infrastructure", "architecture", "environment", "cultural_elements")
+
+
+class LiveSession:
+    """
+    Estado de una sesión de geolocalización en vivo desde una cámara.
+
+    Los fotogramas casi duplicados se descartan sin coste. Los distintos se
+    guardan como fotogramas clave (hasta `max_keyframes`) y el modelo solo se
+    vuelve a consultar cuando hay información nueva: vistas que difieren de
+    las enviadas en la consulta anterior y en las que la cámara se ha detenido,
+    o, en un barrido rápido, tantas vistas nuevas como caben en una consulta.
+    La evidencia y las coordenadas candidatas se acumulan entre consultas.
+    """
+
+    def __init__(self, analyze_frames, max_keyframes=6, requery_new_frames=2, min_requery_seconds=5.0):
+        self.analyze_frames = analyze_frames
+        self.max_keyframes = max_keyframes
+        self.requery_new_frames = requery_new_frames
+        self.min_requery_seconds = min_requery_seconds
+
+        self.keyframes = []
+        self.candidates = []
+        self.evidence = {field: "Not specified" for field in EVIDENCE_FIELDS}
+        self.result = None
+
+        self.frames_received = 0
+        self.frames_skipped = 0
+        self.model_calls = 0
+        self._last_query = None
+        # Firmas de los fotogramas enviados al modelo en la última consulta y
+        # fotogramas clave distintos de todos ellos llegados desde entonces
+        self._queried_signatures = []
+        self._unseen_since_query = 0
+
+    def add_frame(self, image):
+        """
+        Procesa un fotograma; devuelve el evento a enviar al cliente
+        """
+        self.frames_received += 1
+        frame_number = self.frames_received
+        signature, sharpness = frame_signature(image)
+
+        differences = [frame_difference(signature, keyframe["signature"]) for keyframe in self.keyframes]
+        novelty = min(differences, default=1.0)
+
+        if novelty < DUPLICATE_THRESHOLD:
+            self.frames_skipped += 1
+            # La cámara se ha detenido en una vista ya guardada
+            self.keyframes[differences.index(novelty)]["settled"] = True
+            if not self._should_requery():
+                return {"type": "skipped", "frame": frame_number, "novelty": round(novelty, 4)}
+        else:
+            self.keyframes.append({
+                "image": image.convert("RGB"),
+                "signature": signature,
+                "sharpness": sharpness,
+                "frame_index": frame_number,
+                # Ganancia de información: diferencia con lo que el modelo vio en la consulta anterior
+                "gain": min((frame_difference(signature, queried) for queried in self._queried_signatures), default=1.0),
+                "settled": False
+            })
+            if self.keyframes[-1]["gain"] >= SCENE_CHANGE_THRESHOLD:
+                self._unseen_since_query += 1
+            if len(self.keyframes) > self.max_keyframes:
+                self.keyframes.pop(most_redundant(self.keyframes))
+
+            if not self._should_requery():
+                return {"type": "keyframe", "frame": frame_number, "novelty": round(novelty, 4), "keyframes": len(self.keyframes)}
+
+        return {"type": "result", "frame": frame_number, "data": self.query(frame_number)}
+
+    def _should_requery(self):
+        # El límite de frecuencia va primero: si la primera consulta falla
+        # (modelo saturado, error de la API) no se reintenta en cada fotograma
+        if self._last_query is not None and time.monotonic() - self._last_query < self.min_requery_seconds:
+            return False
+        if self.result is None:
+            return True
+
+        settled = [keyframe for keyframe in self.keyframes if keyframe["settled"] and keyframe["gain"] >= SCENE_CHANGE_THRESHOLD]
+        # Un cambio de escena claro en el que la cámara se detiene basta por sí solo
+        if len(settled) >= self.requery_new_frames or any(keyframe["gain"] >= 2 * SCENE_CHANGE_THRESHOLD for keyframe in settled):
+            return True
+        # En un barrido rápido ninguna vista se asienta: se consulta cada vez que
+        # llegan tantas vistas nuevas como caben en una consulta, no con cada una
+        return self._unseen_since_query >= self.max_keyframes
+
+    def query(self, frame_number=None):
+        """
+        Consulta el modelo con los fotogramas clave y la evaluación acumulada
+        """
+        self._last_query = time.monotonic()
+
+        keyframes = sorted(self.keyframes, key=lambda keyframe: keyframe["frame_index"])
+        analysis_data = self.analyze_frames([keyframe["image"] for keyframe in keyframes], self.context_notes())
+        self.model_calls += 1
+        self._queried_signatures = [keyframe["signature"] for keyframe in keyframes]
+        self._unseen_since_query = 0
+        for keyframe in self.keyframes:
+            keyframe["gain"] = 0.0
+
+        self._merge(analysis_data)
+        self.result = self._refined_result(analysis_data, frame_number)
+        return self.result
+
+    def context_notes(self):
+        """
+        Resumen de la evaluación previa para que el modelo la refine en lugar de empezar de cero
+        """
+        if self.result is None:
+            return []
+
+        lines = [
+            "EVALUACIÓN PREVIA DE ESTA SESIÓN EN VIVO (refínala con los fotogramas nuevos):",
+            f"Country: {self.result.get('country', 'Unknown')}",
+            f"City/Region: {self.result.get('region_or_city', 'Unknown')}"
+        ]
+        for candidate in self.candidates[:3]:
+            lines.append(f"Candidate: {candidate['lat']:.6f}, {candidate['lng']:.6f} (support {candidate['support']:.1f})")
+        for field in EVIDENCE_FIELDS:
+            if self.evidence[field] != "Not specified":
+                lines.append(f"{field}: {self.evidence[field]}")
+
+        return ["\n".join(lines)]
+
+    def _merge(self, analysis_data):
+        details = analysis_data.get("detailed_analysis", {})
+
+        # Evidencia: los campos nuevos sustituyen a los anteriores, los vacíos se conservan
+        for field, value in details.get("evidence", {}).items():
+            if field in self.evidence and value and value != "Not specified":
+                self.evidence[field] = value
+
+        points = [(details.get("primary_coordinates", {}), PRIMARY_WEIGHT)]
+        points += [(location, ALTERNATIVE_WEIGHT) for location in details.get("alternative_locations", [])]
+
+        for location, weight in points:
+            if location.get("lat") is None or location.get("lng") is None:
+                continue
+
+            if self.candidates:
+                distances = haversine_km(
+                    location["lat"], location["lng"],
+                    np.array([candidate["lat"] for candidate in self.candidates]),
+                    np.array([candidate["lng"] for candidate in self.candidates])
+                )
+                nearest = int(np.argmin(distances))
+                if distances[nearest] <= CANDIDATE_MERGE_RADIUS_KM:
+                    candidate = self.candidates[nearest]
+                    total = candidate["support"] + weight
+                    candidate["lat"] = (candidate["lat"] * candidate["support"] + location["lat"] * weight) / total
+                    candidate["lng"] = (candidate["lng"] * candidate["support"] + location["lng"] * weight) / total
+                    candidate["support"] = total
+                    continue
+
+            self.candidates.append({"lat": location["lat"], "lng": location["lng"], "support": weight})
+
+        self.candidates.sort(key=lambda candidate: candidate["support"], reverse=True)
+
+    def _refined_result(self, analysis_data, frame_number):
+        result = dict(analysis_data)
+        details = dict(result.get("detailed_analysis", {}))
+
+        if self.candidates:
+            ranked = [{"lat": round(candidate["lat"], 6), "lng": round(candidate["lng"], 6)} for candidate in self.candidates[:3]]
+            while len(ranked) < 3:
+                ranked.append({"lat": None, "lng": None})
+            details["primary_coordinates"] = ranked[0]
+            details["alternative_locations"] = ranked[1:]
+            result["coordinates"] = f"{ranked[0]['lat']:.6f}, {ranked[0]['lng']:.6f}"
+
+        details["evidence"] = dict(self.evidence)
+        result["detailed_analysis"] = details
+        result["live_session"] = self.stats(frame_number)
+        return result
+
+    def stats(self, frame_number=None):
+        return {
+            "frame": frame_number,
+            "frames_received": self.frames_received,
+            "frames_skipped": self.frames_skipped,
+            "keyframes": len(self.keyframes),
+            "model_calls": self.model_calls,
+            "candidates": [{
+                "lat": round(candidate["lat"], 6),
+                "lng": round(candidate["lng"], 6),
+                "support": round(candidate["support"], 2)
+            } for candidate in self.candidates[:5]]
+        }
+
+    def reset(self):
+        self.__init__(self.analyze_frames, self.max_keyframes, self.requery_new_frames, self.min_requery_seconds)
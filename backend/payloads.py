@@ -0,0 +1,102 @@
+# /backend/payloads.py
+
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MSGPACK_MIMETYPE = "application/x-msgpack"
+
+# Campos con el texto completo del modelo: se omiten en modo compacto salvo que se pidan
+RAW_TEXT_FIELDS = ("reasoning", "raw_response")
+
+# Por debajo de este tamaño comprimir no compensa
+MIN_COMPRESS_BYTES = 512
+
+
+def parse_fields(value):
+    """
+    Convierte "country,detailed_analysis.primary_coordinates" en una lista de rutas
+    """
+    if not value:
+        return []
+    return [tuple(part for part in field.strip().split(".") if part) for field in value.split(",") if field.strip()]
+
+
+def select_fields(data, fields):
+    """
+    Devuelve solo las rutas pedidas (con notación de puntos) de un diccionario
+    """
+    selected = {}
+    for path in fields:
+        source, target = data, selected
+        for i, key in enumerate(path):
+            if not isinstance(source, dict) or key not in source:
+                break
+            if i == len(path) - 1:
+                target[key] = source[key]
+            else:
+                source = source[key]
+                target = target.setdefault(key, {})
+    return selected
+
+
+def compact_payload(data):
+    """
+    Quita el texto completo del modelo y resume las listas de pistas de Lens
+    """
+    if not isinstance(data, dict):
+        return data
+
+    compacted = {key: value for key, value in data.items() if key not in RAW_TEXT_FIELDS}
+
+    lens = compacted.get("google_lens_analysis")
+    if isinstance(lens, dict) and isinstance(lens.get("location_clues"), list):
+        clues = lens["location_clues"]
+        compacted["google_lens_analysis"] = {
+            **{key: value for key, value in lens.items() if key != "location_clues"},
+            "top_clue": clues[0] if clues else None
+        }
+
+    return compacted
+
+
+def shape_payload(data, fields=None, compact=False):
+    """
+    Aplica selección de campos y/o modo compacto a una respuesta de análisis
+    """
+    if fields:
+        return select_fields(data, fields) if isinstance(data, dict) else data
+    if compact:
+        return compact_payload(data)
+    return data
+
+
+def encode_payload(data, mimetype):
+    """
+    Serializa la respuesta como JSON compacto o MessagePack
+    """
+    if mimetype == MSGPACK_MIMETYPE and msgpack is not None:
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def available_encodings():
+    """
+    Codificaciones de contenido soportadas, en orden de preferencia del servidor
+    """
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
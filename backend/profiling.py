@@ -0,0 +1,153 @@
+# /backend/profiling.py
+
+import cProfile
+import hmac
+import inspect
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+
+# Profundidad de pila registrada por tracemalloc (para atribuir asignaciones a etapas)
+TRACEMALLOC_FRAMES = 12
+
+
+class RequestProfiler:
+    """
+    Perfilado opcional por petición con cProfile y tracemalloc.
+
+    Modo explícito: cabeceras X-Profile: 1 y X-Profile-Token (el informe se
+    devuelve en la respuesta). Modo muestreo: una fracción de las peticiones se
+    perfila y el informe se guarda en disco. tracemalloc es global al proceso,
+    así que solo se perfila una petición a la vez.
+    """
+
+    def __init__(self, token=None, sample_rate=0.0, report_dir=None, top_n=15, max_reports=200):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.report_dir = report_dir
+        self.top_n = top_n
+        self.max_reports = max_reports
+
+        self._busy = threading.Lock()
+        self._stages = []
+
+    def add_stage(self, name, path_fragment=None, function=None):
+        """
+        Registra una etapa para agrupar asignaciones: por fragmento de ruta de
+        archivo (ej. "/PIL/") o por el rango de líneas de una función
+        """
+        if function is not None:
+            source_lines, first_line = inspect.getsourcelines(function)
+            self._stages.append((name, function.__code__.co_filename, range(first_line, first_line + len(source_lines))))
+        else:
+            self._stages.append((name, path_fragment, None))
+
+    def mode(self, headers, args):
+        """
+        Decide si se perfila la petición: "inline", "sampled" o None
+        """
+        if headers.get("X-Profile") == "1" or args.get("profile") == "1":
+            # Se comparan bytes: compare_digest rechaza str con caracteres no ASCII
+            supplied = headers.get("X-Profile-Token", "").encode("utf-8")
+            if self.token and hmac.compare_digest(supplied, self.token.encode("utf-8")):
+                return "inline"
+            return None
+
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+
+        return None
+
+    def run(self, function, *args, **kwargs):
+        """
+        Ejecuta `function` perfilada; devuelve (resultado, informe o None)
+        """
+        if not self._busy.acquire(blocking=False):
+            return function(*args, **kwargs), None
+
+        try:
+            profile = cProfile.Profile()
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            started = time.perf_counter()
+
+            profile.enable()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                profile.disable()
+                wall_time = time.perf_counter() - started
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+            return result, self._build_report(profile, snapshot, peak, wall_time)
+        finally:
+            self._busy.release()
+
+    def _build_report(self, profile, snapshot, peak, wall_time):
+        stats = pstats.Stats(profile)
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top_n]
+
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ])
+
+        by_line = snapshot.statistics("lineno")[:self.top_n]
+
+        stages = {name: 0 for name, _, _ in self._stages}
+        for trace in snapshot.traces:
+            stage = self._stage_for(trace.traceback)
+            if stage:
+                stages[stage] += trace.size
+
+        return {
+            "wall_time": round(wall_time, 4),
+            "peak_allocated_bytes": peak,
+            "top_functions": [{
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": primitive_calls,
+                "total_time": round(total_time, 4),
+                "cumulative_time": round(cumulative_time, 4)
+            } for (filename, line, name), (primitive_calls, _, total_time, cumulative_time, _) in functions],
+            "allocations": [{
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_bytes": stat.size,
+                "count": stat.count
+            } for stat in by_line],
+            "allocations_by_stage": stages
+        }
+
+    def _stage_for(self, traceback):
+        # Se atribuye a la etapa del marco más interno que coincida
+        for frame in reversed(traceback):
+            for name, path, lines in self._stages:
+                if lines is None:
+                    if path in frame.filename:
+                        return name
+                elif frame.filename == path and frame.lineno in lines:
+                    return name
+        return None
+
+    def store(self, report, endpoint):
+        """
+        Guarda un informe muestreado en disco y devuelve su identificador
+        """
+        if not self.report_dir:
+            return None
+
+        os.makedirs(self.report_dir, exist_ok=True)
+        report_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint.strip('/').replace('/', '_')}-{random.randrange(16 ** 6):06x}"
+        with open(os.path.join(self.report_dir, report_id + ".json"), "w", encoding="utf-8") as f:
+            json.dump({"endpoint": endpoint, **report}, f)
+
+        # Conservar solo los informes más recientes
+        reports = sorted(name for name in os.listdir(self.report_dir) if name.endswith(".json"))
+        for name in reports[:max(0, len(reports) - self.max_reports)]:
+            os.remove(os.path.join(self.report_dir, name))
+
+        return report_id
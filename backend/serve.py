@@ -0,0 +1,144 @@
+# /backend/serve.py
+
+"""
+Servidor de producción pre-fork.
+
+La inicialización costosa (modelo, gazetteer, índice visual mapeado en memoria)
+se hace una sola vez en el proceso padre; después se crean WORKERS procesos con
+fork que comparten esas páginas copy-on-write y el mismo socket de escucha.
+Cada worker atiende con hilos, y la caché de resultados, las métricas y las
+imágenes nuevas del índice visual se comparten a través del SQLite en modo WAL.
+
+Uso: WORKERS=8 PORT=5001 python serve.py
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+# Debe fijarse antes de importar app: con varios workers el índice visual
+# solo puede funcionar en modo compartido
+os.environ["VISUAL_INDEX_SHARED"] = "true"
+
+from werkzeug.serving import make_server
+import app as backend
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "5001"))
+WORKERS = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
+LISTEN_BACKLOG = int(os.getenv("LISTEN_BACKLOG", "1024"))
+# Cada cuánto el proceso padre vuelca a disco las imágenes indexadas por los workers
+PERSIST_INTERVAL_SECONDS = float(os.getenv("PERSIST_INTERVAL_SECONDS", "300"))
+# Un worker que muere antes de este tiempo se relanza con retraso (evita bucles de caídas)
+MIN_WORKER_UPTIME_SECONDS = 5.0
+
+
+def run_worker(listener):
+    """
+    Bucle de un worker: servidor WSGI con hilos sobre el socket heredado
+    """
+    backend.init_worker()
+    server = make_server(HOST, PORT, backend.app, threaded=True, fd=listener.fileno())
+
+    def stop(signum, frame):
+        # shutdown() espera a que termine serve_forever, así que se lanza desde otro hilo
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    # Ctrl+C llega a todo el grupo de procesos: la parada la coordina el padre
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    server.serve_forever()
+    backend.shared_state.flush()
+
+
+def spawn_worker(listener):
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 0
+        try:
+            run_worker(listener)
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            # Nunca volver al bucle del padre desde un worker
+            os._exit(exit_code)
+    backend.track_worker(pid)
+    return pid
+
+
+def main():
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py requiere un sistema POSIX (os.fork); en otros sistemas usa app.py")
+
+    # Imágenes que quedaron pendientes de una ejecución anterior
+    backend.start_shared_index()
+    backend.persist_shared_index()
+
+    listener = socket.create_server((HOST, PORT), backlog=LISTEN_BACKLOG)
+
+    # Los objetos creados durante la inicialización no los vuelve a recorrer el
+    # GC, así que sus páginas no se copian en cada worker
+    gc.collect()
+    gc.freeze()
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    workers = {}
+    for _ in range(WORKERS):
+        workers[spawn_worker(listener)] = time.monotonic()
+    print(f"✓ Servidor pre-fork escuchando en {HOST}:{PORT} con {WORKERS} workers")
+
+    next_persist = time.monotonic() + PERSIST_INTERVAL_SECONDS
+    signalled = False
+
+    while workers:
+        if stopping and not signalled:
+            for pid in workers:
+                os.kill(pid, signal.SIGTERM)
+            signalled = True
+
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        if pid == 0:
+            if not stopping and time.monotonic() >= next_persist:
+                backend.persist_shared_index()
+                next_persist = time.monotonic() + PERSIST_INTERVAL_SECONDS
+            time.sleep(0.5)
+            continue
+
+        started = workers.pop(pid, None)
+        backend.forget_worker(pid)
+        if stopping or started is None:
+            continue
+
+        print(f"⚠️  Worker {pid} terminó inesperadamente; relanzando")
+        if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+            time.sleep(MIN_WORKER_UPTIME_SECONDS)
+        workers[spawn_worker(listener)] = time.monotonic()
+
+    listener.close()
+    backend.persist_shared_index()
+    backend.shared_state.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# /backend/shared_state.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+# Cada cuántas escrituras en la caché se purgan las entradas caducadas o sobrantes
+PRUNE_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS result_cache (
+    key TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS result_cache_created ON result_cache (created);
+CREATE TABLE IF NOT EXISTS metrics (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS index_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    vector BLOB NOT NULL,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS index_cursors (
+    pid INTEGER PRIMARY KEY,
+    last_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def result_key(route, payloads, **params):
+    """
+    Clave de caché: SHA-256 de los bytes subidos más la ruta y los parámetros
+    que cambian el resultado
+    """
+    digest = hashlib.sha256(route.encode("utf-8"))
+    for payload in payloads:
+        digest.update(hashlib.sha256(payload).digest())
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SharedState:
+    """
+    Estado compartido entre procesos en un SQLite en modo WAL: caché de
+    resultados, contadores agregados y cola de imágenes nuevas del índice visual.
+    Cada proceso anota hasta qué entrada de la cola ha leído, y solo se borran
+    las que ya han leído todos.
+
+    Cada proceso abre su propia conexión (una conexión heredada tras un fork
+    no se reutiliza) y la comparte entre sus hilos con un lock. Los contadores
+    se acumulan en memoria y se vuelcan como mucho cada `flush_seconds`, así
+    que no se escribe en cada petición.
+    """
+
+    def __init__(self, path, cache_ttl=86400, cache_max_entries=5000, flush_seconds=1.0):
+        self.path = path
+        self.cache_ttl = cache_ttl
+        self.cache_max_entries = cache_max_entries
+        self.flush_seconds = flush_seconds
+
+        self._db_lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._puts = 0
+
+        with self._db() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        with self._db_lock:
+            if self._pid != os.getpid():
+                self._connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute("PRAGMA synchronous=NORMAL")
+                self._pid = os.getpid()
+            yield self._connection
+
+    def after_fork(self):
+        """
+        Descarta el estado heredado del proceso padre (llamar en cada worker)
+        """
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    # --- Caché de resultados ---
+
+    def cache_get(self, key):
+        with self._db() as connection:
+            row = connection.execute(
+                "SELECT body FROM result_cache WHERE key = ? AND created >= ?",
+                (key, time.time() - self.cache_ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def cache_put(self, key, value):
+        body = json.dumps(value, ensure_ascii=False)
+        with self._db() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO result_cache (key, created, body) VALUES (?, ?, ?)",
+                (key, time.time(), body)
+            )
+
+            self._puts += 1
+            if self._puts % PRUNE_EVERY == 0:
+                connection.execute("DELETE FROM result_cache WHERE created < ?", (time.time() - self.cache_ttl,))
+                connection.execute(
+                    "DELETE FROM result_cache WHERE key IN "
+                    "(SELECT key FROM result_cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.cache_max_entries,)
+                )
+
+    def cache_size(self):
+        with self._db() as connection:
+            return connection.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+
+    # --- Métricas agregadas ---
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._pending[name] = self._pending.get(name, 0) + amount
+            due = time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Suma los contadores pendientes de este proceso a los totales compartidos
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+
+        with self._db() as connection:
+            connection.executemany(
+                "INSERT INTO metrics (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                list(pending.items())
+            )
+
+    def start_flusher(self):
+        """
+        Vuelca los contadores periódicamente aunque el proceso esté ocioso
+        """
+        def loop():
+            while True:
+                time.sleep(self.flush_seconds)
+                self.flush()
+
+        threading.Thread(target=loop, name="shared-state-flush", daemon=True).start()
+
+    def metrics(self):
+        self.flush()
+        with self._db() as connection:
+            rows = connection.execute("SELECT name, value FROM metrics ORDER BY name").fetchall()
+        return {name: int(value) if float(value).is_integer() else round(value, 4) for name, value in rows}
+
+    # --- Valores sueltos (p. ej. la última entrada volcada al índice en disco) ---
+
+    def get_meta(self, name, default=None):
+        with self._db() as connection:
+            row = connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, name, value):
+        with self._db() as connection:
+            connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, json.dumps(value)))
+
+    # --- Imágenes nuevas del índice visual ---
+
+    def append_index_entry(self, vector, lat, lng, record):
+        row = (np.asarray(vector, dtype=np.float32).tobytes(), lat, lng, json.dumps(record, ensure_ascii=False))
+        with self._db() as connection:
+            connection.execute("INSERT INTO index_entries (vector, lat, lng, record) VALUES (?, ?, ?, ?)", row)
+
+    def index_entries(self, after_id=0):
+        """
+        Entradas posteriores a `after_id`: (id, vector, lat, lng, registro)
+        """
+        with self._db() as connection:
+            rows = connection.execute(
+                "SELECT id, vector, lat, lng, record FROM index_entries WHERE id > ? ORDER BY id",
+                (after_id,)
+            ).fetchall()
+        for entry_id, vector, lat, lng, record in rows:
+            yield entry_id, np.frombuffer(vector, dtype=np.float32), lat, lng, json.loads(record)
+
+    def set_index_cursor(self, last_id, pid=None):
+        """
+        Anota que el proceso `pid` (por defecto este) ya leyó hasta `last_id`
+        """
+        with self._db() as connection:
+            connection.execute(
+                "INSERT INTO index_cursors (pid, last_id) VALUES (?, ?) "
+                "ON CONFLICT (pid) DO UPDATE SET last_id = MAX(last_id, excluded.last_id)",
+                (pid or os.getpid(), last_id)
+            )
+
+    def drop_index_cursor(self, pid):
+        with self._db() as connection:
+            connection.execute("DELETE FROM index_cursors WHERE pid = ?", (pid,))
+
+    def reset_index_cursors(self):
+        """
+        Olvida los cursores de una ejecución anterior (procesos que ya no existen)
+        """
+        with self._db() as connection:
+            connection.execute("DELETE FROM index_cursors")
+
+    def clear_index_entries(self):
+        """
+        Borra las entradas que ya han leído todos los procesos con cursor
+        """
+        with self._db() as connection:
+            connection.execute("DELETE FROM index_entries WHERE id <= (SELECT MIN(last_id) FROM index_cursors)")
@@ -0,0 +1,199 @@
+# /backend/signage_crops.py
+
+import math
+from PIL import Image
+
+# Gemini cobra ~258 tokens por imagen de hasta 384px y trocea en teselas de 768px
+# las más grandes: la vista general se limita a 768px y cada recorte a 384px
+OVERVIEW_MAX_SIDE = 768
+CROP_MAX_SIDE = 384
+
+# Margen alrededor de cada región de texto, en alturas de línea
+CROP_PADDING_LINES = 1.0
+
+# Un cartel más largo que un recorte se divide en teselas a resolución nativa
+# (como mucho estas); si necesitaría más, se recorta entero y se reduce
+MAX_TILES_PER_REGION = 3
+
+# Distancia máxima (en alturas de línea) para fusionar palabras en una misma región
+MERGE_DISTANCE = 1.5
+
+# Regiones con lado menor a esto (en píxeles) se descartan: son ruido del OCR
+MIN_REGION_SIDE = 8
+
+# Lado mayor de las copias enviadas a TEXT_DETECTION: varias fotos de móvil a
+# resolución completa superan el tamaño máximo de una petición a Vision
+TEXT_DETECTION_MAX_SIDE = 1600
+
+
+def _annotation_box(annotation):
+    """
+    Convierte el boundingPoly de una anotación de Vision en una caja (x0, y0, x1, y1)
+    """
+    vertices = annotation.get("boundingPoly", {}).get("vertices", [])
+    if not vertices:
+        return None
+    xs = [vertex.get("x", 0) for vertex in vertices]
+    ys = [vertex.get("y", 0) for vertex in vertices]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _boxes_are_close(a, b):
+    line_height = max(min(a[3] - a[1], b[3] - b[1]), 1)
+    gap = line_height * MERGE_DISTANCE
+    return not (
+        a[2] + gap < b[0] or b[2] + gap < a[0] or
+        a[3] + gap < b[1] or b[3] + gap < a[1]
+    )
+
+
+def text_regions_from_annotations(text_annotations):
+    """
+    Agrupa las palabras detectadas por TEXT_DETECTION en regiones de texto
+    (un cartel, una matrícula, una placa de calle...)
+    """
+    # La primera anotación es el bloque completo de texto: se usan las palabras
+    words = []
+    for annotation in text_annotations[1:]:
+        box = _annotation_box(annotation)
+        if not box:
+            continue
+        if min(box[2] - box[0], box[3] - box[1]) < MIN_REGION_SIDE:
+            continue
+        words.append((box, annotation.get("description", "")))
+
+    # Agrupar palabras cercanas (union-find sobre pares de cajas próximas)
+    parent = list(range(len(words)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(words)):
+        for j in range(i + 1, len(words)):
+            if _boxes_are_close(words[i][0], words[j][0]):
+                parent[find(j)] = find(i)
+
+    groups = {}
+    for i, (box, text) in enumerate(words):
+        group = groups.setdefault(find(i), {"box": list(box), "text": [], "heights": []})
+        group["box"] = [
+            min(group["box"][0], box[0]), min(group["box"][1], box[1]),
+            max(group["box"][2], box[2]), max(group["box"][3], box[3])
+        ]
+        group["text"].append(text)
+        group["heights"].append(box[3] - box[1])
+
+    regions = [{
+        "box": group["box"],
+        "text": " ".join(group["text"]),
+        "line_height": sorted(group["heights"])[len(group["heights"]) // 2]
+    } for group in groups.values()]
+
+    # Priorizar las regiones con más texto legible
+    regions.sort(key=lambda region: len(region["text"]), reverse=True)
+    return regions
+
+
+def scale_annotations(text_annotations, scale):
+    """
+    Lleva las cajas de TEXT_DETECTION de una copia reducida a la imagen original
+    """
+    if scale == 1:
+        return text_annotations
+    scaled = []
+    for annotation in text_annotations:
+        vertices = annotation.get("boundingPoly", {}).get("vertices", [])
+        scaled.append({
+            **annotation,
+            "boundingPoly": {"vertices": [
+                {"x": round(vertex.get("x", 0) * scale), "y": round(vertex.get("y", 0) * scale)}
+                for vertex in vertices
+            ]}
+        })
+    return scaled
+
+
+def downscale(image, max_side):
+    """
+    Reduce una imagen para que su lado mayor no supere `max_side`
+    """
+    if max(image.size) <= max_side:
+        return image
+    scale = max_side / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def _window(start, end, limit, size):
+    """
+    Intervalo de longitud `size` centrado en [start, end) y desplazado para quedar dentro de [0, limit)
+    """
+    size = min(size, limit)
+    begin = int(round((start + end - size) / 2))
+    begin = min(max(0, begin), limit - size)
+    return begin, begin + size
+
+
+def crop_boxes(box, line_height, width, height):
+    """
+    Cajas de recorte para una región de texto. Cada caja mide CROP_MAX_SIDE
+    (o la imagen entera si es menor), así el texto llega al modelo a su
+    resolución nativa; un cartel largo se cubre con varias teselas solapadas.
+    """
+    padding = CROP_PADDING_LINES * line_height
+    x0, y0 = max(0, int(box[0] - padding)), max(0, int(box[1] - padding))
+    x1, y1 = min(width, int(math.ceil(box[2] + padding))), min(height, int(math.ceil(box[3] + padding)))
+    if x1 <= x0 or y1 <= y0:
+        return []
+
+    horizontal = (x1 - x0) >= (y1 - y0)
+    long_start, long_end, long_limit = (x0, x1, width) if horizontal else (y0, y1, height)
+    short_start, short_end, short_limit = (y0, y1, height) if horizontal else (x0, x1, width)
+
+    count = math.ceil((long_end - long_start) / CROP_MAX_SIDE)
+    if short_end - short_start > CROP_MAX_SIDE or count > MAX_TILES_PER_REGION:
+        # Región demasiado grande: un solo recorte ajustado que después se reduce
+        return [(x0, y0, x1, y1)]
+
+    short_range = _window(short_start, short_end, short_limit, CROP_MAX_SIDE)
+    if count == 1:
+        long_ranges = [_window(long_start, long_end, long_limit, CROP_MAX_SIDE)]
+    else:
+        # Teselas repartidas de extremo a extremo (se solapan lo necesario)
+        step = (long_end - long_start - CROP_MAX_SIDE) / (count - 1)
+        long_ranges = [
+            (int(long_start + i * step), int(long_start + i * step) + CROP_MAX_SIDE)
+            for i in range(count)
+        ]
+
+    if horizontal:
+        return [(begin, short_range[0], end, short_range[1]) for begin, end in long_ranges]
+    return [(short_range[0], begin, short_range[1], end) for begin, end in long_ranges]
+
+
+def build_signage_views(image, text_annotations=None, max_crops=3):
+    """
+    Devuelve una vista general reducida y recortes en alta resolución de las
+    regiones de texto: (overview, [{"image", "text", "box"}, ...]). Sin regiones
+    de texto no hay recortes que compensen la reducción: se devuelve la imagen
+    original como vista general.
+    """
+    rgb = image.convert("RGB")
+
+    crops = []
+    for region in text_regions_from_annotations(text_annotations or []):
+        for box in crop_boxes(region["box"], region["line_height"], rgb.width, rgb.height):
+            if len(crops) >= max_crops:
+                break
+            crops.append({
+                "image": downscale(rgb.crop(box), CROP_MAX_SIDE),
+                "text": region["text"],
+                "box": list(box)
+            })
+
+    if not crops:
+        return image, []
+    return downscale(rgb, OVERVIEW_MAX_SIDE), crops
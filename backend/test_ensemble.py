@@ -0,0 +1,48 @@
+import time
+from admission import AdmissionController
+from ensemble import run_ensemble
+
+# Pruebas del ensemble de muestras: python -m pytest test_ensemble.py
+
+
+def location(lat, lng):
+    return {"detailed_analysis": {"primary_coordinates": {"lat": lat, "lng": lng}, "alternative_locations": []}}
+
+
+def test_timeout_is_a_single_deadline():
+    def sample(index, cancelled):
+        # Cada muestra termina antes del timeout, pero ninguna coincide con otra
+        time.sleep(0.2 * (index + 1))
+        return location(index * 10.0, 0.0)
+
+    started = time.monotonic()
+    results, _, _ = run_ensemble(sample, 5, max_parallel=5, agreement=3, radius_km=25, timeout=0.5)
+
+    assert time.monotonic() - started < 0.7
+    assert len(results) == 2
+
+
+def test_early_stop_releases_queued_model_slots():
+    admission = AdmissionController(slo_seconds=10, model_concurrency=1)
+    calls = []
+
+    def sample(index, cancelled):
+        with admission.model_slot("/api/analyze", lane="model", cancelled=cancelled):
+            calls.append(index)
+            time.sleep(0.05)
+            return location(48.8566, 2.3522)
+
+    results, clusters, stopped_early = run_ensemble(sample, 5, max_parallel=5, agreement=2, radius_km=25)
+
+    assert stopped_early
+    assert len(clusters[0]["primary_samples"]) == 2
+
+    # Las muestras que esperaban slot lo abandonan sin llamar al modelo
+    for _ in range(40):
+        snapshot = admission.snapshot()
+        if snapshot["model_waiting"] == 0 and snapshot["model_running"] == 0:
+            break
+        time.sleep(0.05)
+    assert snapshot["model_waiting"] == 0 and snapshot["model_running"] == 0
+    assert len(calls) <= 3
+    assert snapshot["endpoints"]["/api/analyze"]["rejected"] == 0
@@ -0,0 +1,108 @@
+import io
+import numpy as np
+from PIL import Image
+from keyframes import frame_signature, frame_difference, most_redundant, select_keyframes, SCENE_CHANGE_THRESHOLD
+
+# Pruebas de la selección de fotogramas clave: python -m pytest test_keyframes.py
+
+
+def make_gif(frames):
+    buffer = io.BytesIO()
+    frames[0].save(buffer, "GIF", save_all=True, append_images=frames[1:], duration=40)
+    buffer.seek(0)
+    return buffer
+
+
+def panorama(seed=1):
+    """
+    Escena ancha y suave; con paleta fija para que codificar el GIF sea rápido
+    """
+    rng = np.random.default_rng(seed)
+    image = Image.fromarray((rng.random((12, 60, 3)) * 255).astype(np.uint8)).resize((600, 120), Image.Resampling.BICUBIC)
+    return image.quantize(64)
+
+
+def pan_frames(seed=1, step=2):
+    world = panorama(seed)
+    return [world.crop((x, 0, x + 120, 120)) for x in range(0, 480, step)]
+
+
+def candidate(signature, sharpness=0.1):
+    return {"signature": np.asarray(signature, dtype=np.float32), "sharpness": sharpness}
+
+
+def test_slow_pan_produces_several_keyframes():
+    frames = pan_frames()
+
+    signatures = [frame_signature(frame.convert("RGB"))[0] for frame in frames]
+    # Ningún par consecutivo supera el umbral, pero el barrido completo sí
+    assert max(frame_difference(a, b) for a, b in zip(signatures, signatures[1:])) < SCENE_CHANGE_THRESHOLD
+    assert frame_difference(signatures[0], signatures[-1]) >= SCENE_CHANGE_THRESHOLD
+
+    pool, stats = select_keyframes([make_gif(frames)], budget=6)
+
+    assert len(pool) == 6
+    assert stats["frames_decoded"] == len(frames)
+    assert stats["scenes"] > 1
+    assert [keyframe["frame_index"] for keyframe in pool] == sorted(keyframe["frame_index"] for keyframe in pool)
+
+
+def test_static_clip_produces_one_keyframe():
+    frame = panorama().crop((0, 0, 120, 120))
+    pool, stats = select_keyframes([make_gif([frame] * 20)], budget=6)
+
+    assert len(pool) == 1
+    assert stats["scenes"] == 1
+    assert pool[0]["novelty"] == 1.0
+
+
+def test_hard_cuts_are_separate_scenes():
+    frames = []
+    for seed in (1, 2, 3):
+        # Desplazamientos de 1px: casi iguales, pero el GIF no los fusiona
+        frames += [panorama(seed).crop((x, 0, x + 120, 120)) for x in range(5)]
+
+    pool, stats = select_keyframes([make_gif(frames)], budget=6)
+
+    assert stats["scenes"] == 3
+    assert [keyframe["frame_index"] // 5 for keyframe in pool] == [0, 1, 2]
+
+
+def test_budget_and_max_frames_are_respected():
+    pool, stats = select_keyframes([make_gif(pan_frames())], budget=3, max_frames=100)
+
+    assert len(pool) <= 3
+    assert stats["frames_decoded"] == 100
+
+
+def test_burst_of_separate_files():
+    files = []
+    for seed in (1, 2):
+        buffer = io.BytesIO()
+        panorama(seed).crop((0, 0, 120, 120)).save(buffer, "PNG")
+        buffer.seek(0)
+        files.append(buffer)
+
+    pool, _ = select_keyframes(files, budget=6)
+
+    assert [(keyframe["file_index"], keyframe["frame_index"]) for keyframe in pool] == [(0, 0), (1, 0)]
+
+
+def test_most_redundant_picks_closest_pair_member():
+    pool = [
+        candidate(np.zeros((4, 4))),
+        candidate(np.full((4, 4), 0.02), sharpness=0.5),
+        candidate(np.ones((4, 4)))
+    ]
+
+    # Los dos primeros son casi iguales: se descarta el menos nítido
+    assert most_redundant(pool) == 0
+
+
+def test_most_redundant_breaks_ties_by_sharpness():
+    pool = [
+        candidate(np.zeros((4, 4)), sharpness=0.9),
+        candidate(np.zeros((4, 4)), sharpness=0.1)
+    ]
+
+    assert most_redundant(pool) == 1
@@ -0,0 +1,94 @@
+import numpy as np
+from PIL import Image, ImageOps
+from live_session import LiveSession
+from test_keyframes import panorama
+
+# Pruebas de cuándo se vuelve a consultar el modelo en una sesión en vivo: python -m pytest test_live_session.py
+
+
+def make_session(max_keyframes=6):
+    calls = []
+
+    def analyze_frames(images, context_notes):
+        calls.append(len(images))
+        return {"detailed_analysis": {}}
+
+    return LiveSession(analyze_frames, max_keyframes, requery_new_frames=2, min_requery_seconds=0), calls
+
+
+def wide_scene(width, seed=1):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray((rng.random((12, width // 10, 3)) * 255).astype(np.uint8)).resize((width, 120), Image.Resampling.BICUBIC)
+
+
+def test_static_camera_queries_once():
+    session, calls = make_session()
+    frame = panorama().convert("RGB").crop((0, 0, 120, 120))
+
+    events = [session.add_frame(frame) for _ in range(30)]
+
+    assert len(calls) == 1
+    assert [event["type"] for event in events[1:]] == ["skipped"] * 29
+
+
+def test_slow_pan_does_not_query_on_every_new_keyframe():
+    session, calls = make_session()
+    world = panorama().convert("RGB")
+
+    for x in range(300):
+        session.add_frame(world.crop((x, 0, x + 120, 120)))
+
+    keyframes_added = session.frames_received - session.frames_skipped
+    assert keyframes_added > 100
+    assert len(calls) <= keyframes_added // 4
+
+
+def test_fast_pan_queries_once_per_renewed_keyframe_set():
+    session, calls = make_session()
+    world = wide_scene(2520)
+
+    # Cada fotograma es una vista nueva: se consulta una vez por cada 6 vistas
+    for x in range(0, 2400, 8):
+        session.add_frame(world.crop((x, 0, x + 120, 120)))
+
+    assert session.frames_skipped == 0
+    assert len(calls) <= 1 + session.frames_received // 6
+
+
+def test_cut_to_a_new_scene_queries_once_it_settles():
+    session, calls = make_session()
+    first = panorama(1).convert("RGB").crop((0, 0, 120, 120))
+    second = ImageOps.invert(first)
+
+    for _ in range(5):
+        session.add_frame(first)
+    cut = session.add_frame(second)
+    settled = session.add_frame(second)
+    rest = [session.add_frame(second) for _ in range(5)]
+
+    assert cut["type"] == "keyframe"
+    assert settled["type"] == "result"
+    assert all(event["type"] == "skipped" for event in rest)
+    assert calls == [1, 2]
+
+
+def test_failed_first_query_is_throttled():
+    calls = []
+
+    def analyze_frames(images, context_notes):
+        calls.append(len(images))
+        raise RuntimeError("429 Resource exhausted")
+
+    session = LiveSession(analyze_frames, 6, requery_new_frames=2, min_requery_seconds=5)
+    frame = panorama().convert("RGB").crop((0, 0, 120, 120))
+
+    failures = 0
+    for _ in range(20):
+        try:
+            session.add_frame(frame)
+        except RuntimeError:
+            failures += 1
+
+    assert calls == [1]
+    assert failures == 1
+    assert session.result is None
@@ -0,0 +1,337 @@
+# /backend/visual_index.py
+
+import os
+import json
+import threading
+import numpy as np
+from PIL import Image
+
+# Tamaño de la miniatura sobre la que se calculan todos los descriptores
+FEATURE_IMAGE_SIZE = 64
+
+# Bloques del vector de características (histograma de color, bordes, textura, miniatura)
+HUE_BINS = 12
+EDGE_ORIENTATION_BINS = 8
+EDGE_GRID = 2
+TEXTURE_GRID = 4
+THUMBNAIL_SIZE = 8
+
+FEATURE_DIM = (
+    HUE_BINS * 4
+    + EDGE_ORIENTATION_BINS * EDGE_GRID * EDGE_GRID
+    + TEXTURE_GRID * TEXTURE_GRID
+    + THUMBNAIL_SIZE * THUMBNAIL_SIZE
+)
+
+# Peso relativo de cada bloque antes de la normalización final
+BLOCK_WEIGHTS = (1.0, 0.8, 0.5, 1.2)
+
+# Hiperplanos fijos para el código SimHash de 64 bits (la semilla no debe cambiar:
+# los códigos persistidos en disco dependen de ella)
+HASH_BITS = 64
+_HASH_PLANES = np.random.default_rng(20240601).standard_normal((FEATURE_DIM, HASH_BITS)).astype(np.float32)
+_HASH_WEIGHTS = (np.uint64(1) << np.arange(HASH_BITS - 1, -1, -1, dtype=np.uint64))
+
+QUANTIZATION_SCALE = 127
+
+
+def _normalize_block(block, weight):
+    """
+    Centra y normaliza (L2) un bloque del vector de características
+    """
+    block = block.astype(np.float32).ravel()
+    block = block - block.mean()
+    norm = np.linalg.norm(block)
+    if norm == 0:
+        return block
+    return block * (weight / norm)
+
+
+def extract_visual_features(image):
+    """
+    Extrae un vector compacto de características visuales usando solo PIL/NumPy:
+    histograma HSV, orientación de bordes, energía de textura y miniatura en grises
+    """
+    small = image.convert("RGB").resize(
+        (FEATURE_IMAGE_SIZE, FEATURE_IMAGE_SIZE),
+        Image.Resampling.BILINEAR,
+        reducing_gap=2.0
+    )
+
+    # 1. Histograma de color HSV (tono x saturación alta/baja x brillo alto/bajo)
+    hsv = np.asarray(small.convert("HSV"), dtype=np.uint16)
+    hue = hsv[..., 0] * HUE_BINS // 256
+    saturated = hsv[..., 1] >= 96
+    bright = hsv[..., 2] >= 128
+    color_bins = hue * 4 + saturated * 2 + bright
+    color_hist = np.bincount(color_bins.ravel(), minlength=HUE_BINS * 4)
+
+    # 2. Histograma de orientación de bordes por cuadrante
+    gray = np.asarray(small.convert("L"), dtype=np.float32) / 255.0
+    gx = gray[1:-1, 2:] - gray[1:-1, :-2]
+    gy = gray[2:, 1:-1] - gray[:-2, 1:-1]
+    magnitude = np.hypot(gx, gy)
+    orientation = (np.arctan2(gy, gx) % np.pi) * (EDGE_ORIENTATION_BINS / np.pi)
+    orientation = np.minimum(orientation.astype(np.int64), EDGE_ORIENTATION_BINS - 1)
+
+    rows = np.arange(magnitude.shape[0]) * EDGE_GRID // magnitude.shape[0]
+    cols = np.arange(magnitude.shape[1]) * EDGE_GRID // magnitude.shape[1]
+    cell = rows[:, None] * EDGE_GRID + cols[None, :]
+    edge_hist = np.bincount(
+        (cell * EDGE_ORIENTATION_BINS + orientation).ravel(),
+        weights=magnitude.ravel(),
+        minlength=EDGE_ORIENTATION_BINS * EDGE_GRID * EDGE_GRID
+    )
+
+    # 3. Energía de textura (magnitud media del gradiente en una rejilla 4x4)
+    rows = np.arange(magnitude.shape[0]) * TEXTURE_GRID // magnitude.shape[0]
+    cols = np.arange(magnitude.shape[1]) * TEXTURE_GRID // magnitude.shape[1]
+    cell = rows[:, None] * TEXTURE_GRID + cols[None, :]
+    texture = np.bincount(cell.ravel(), weights=magnitude.ravel(), minlength=TEXTURE_GRID * TEXTURE_GRID)
+
+    # 4. Miniatura en escala de grises (embedding de baja resolución)
+    thumbnail = np.asarray(
+        small.convert("L").resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BOX),
+        dtype=np.float32
+    )
+
+    vector = np.concatenate([
+        _normalize_block(color_hist, BLOCK_WEIGHTS[0]),
+        _normalize_block(edge_hist, BLOCK_WEIGHTS[1]),
+        _normalize_block(texture, BLOCK_WEIGHTS[2]),
+        _normalize_block(thumbnail, BLOCK_WEIGHTS[3])
+    ])
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def simhash_code(vector):
+    """
+    Calcula el código SimHash de 64 bits de un vector de características
+    """
+    bits = (vector @ _HASH_PLANES) > 0
+    return np.uint64(_HASH_WEIGHTS[bits].sum(dtype=np.uint64))
+
+
+class VisualIndex:
+    """
+    Índice aproximado de vecinos cercanos respaldado por arrays NumPy.
+
+    Cada imagen se guarda como un código SimHash de 64 bits (filtro por distancia
+    de Hamming) y un vector int8 cuantizado (re-ranking por similitud coseno).
+
+    Los datos cargados de disco forman un segmento base de solo lectura (con
+    `mmap=True` se mapea en memoria y varios procesos comparten las mismas
+    páginas); las imágenes nuevas van a un segmento delta que crece aparte.
+    Cada `save_every` imágenes nuevas se guarda en segundo plano (None lo desactiva).
+    """
+
+    def __init__(self, path=None, max_hamming=22, rerank_candidates=256, save_every=50, mmap=False):
+        self.path = path
+        self.max_hamming = max_hamming
+        self.rerank_candidates = rerank_candidates
+        self.save_every = save_every
+        self.mmap = mmap
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self._base_size = 0
+        self._base_codes = np.empty(0, dtype=np.uint64)
+        self._base_vectors = np.empty((0, FEATURE_DIM), dtype=np.int8)
+        self._base_coords = np.empty((0, 2), dtype=np.float64)
+        self._size = 0
+        self._codes = np.empty(0, dtype=np.uint64)
+        self._vectors = np.empty((0, FEATURE_DIM), dtype=np.int8)
+        self._coords = np.empty((0, 2), dtype=np.float64)
+        self._records = []
+
+        if path and os.path.isdir(path):
+            self.load()
+
+    def __len__(self):
+        return self._base_size + self._size
+
+    def _reserve(self, capacity):
+        """
+        Asegura capacidad en el segmento delta para `capacity` elementos duplicando los arrays
+        """
+        if capacity <= len(self._codes):
+            return
+
+        new_capacity = max(capacity, 2 * len(self._codes), 1024)
+
+        codes = np.empty(new_capacity, dtype=np.uint64)
+        codes[:self._size] = self._codes[:self._size]
+        vectors = np.empty((new_capacity, FEATURE_DIM), dtype=np.int8)
+        vectors[:self._size] = self._vectors[:self._size]
+        coords = np.empty((new_capacity, 2), dtype=np.float64)
+        coords[:self._size] = self._coords[:self._size]
+
+        self._codes, self._vectors, self._coords = codes, vectors, coords
+
+    def add(self, vector, lat, lng, record=None):
+        """
+        Agrega una imagen geolocalizada al índice
+        """
+        quantized = np.clip(np.rint(vector * QUANTIZATION_SCALE), -127, 127).astype(np.int8)
+        code = simhash_code(vector)
+
+        with self._lock:
+            self._reserve(self._size + 1)
+            self._codes[self._size] = code
+            self._vectors[self._size] = quantized
+            self._coords[self._size] = (lat, lng)
+            self._records.append(record or {})
+            self._size += 1
+            self._unsaved += 1
+            due = self.path and self.save_every and self._unsaved >= self.save_every
+
+        if due:
+            # Reescribir un índice grande tarda segundos: se hace en segundo plano
+            threading.Thread(target=self.save, daemon=True).start()
+
+    def _segments(self):
+        """
+        Segmentos (códigos, vectores, coordenadas, desplazamiento) visibles ahora mismo
+        """
+        with self._lock:
+            return [
+                (self._base_codes[:self._base_size], self._base_vectors[:self._base_size], self._base_coords[:self._base_size], 0),
+                (self._codes[:self._size], self._vectors[:self._size], self._coords[:self._size], self._base_size)
+            ], self._records
+
+    def _search(self, codes, vectors, code, quantized):
+        """
+        Candidatos de un segmento: (índices, similitudes)
+        """
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        # Filtro grueso: distancia de Hamming entre códigos SimHash
+        distances = np.bitwise_count(codes ^ code)
+        candidates = np.flatnonzero(distances <= self.max_hamming)
+        if len(candidates) > self.rerank_candidates:
+            nearest = np.argpartition(distances[candidates], self.rerank_candidates)[:self.rerank_candidates]
+            candidates = candidates[nearest]
+
+        # Re-ranking exacto con los vectores cuantizados
+        similarities = (vectors[candidates].astype(np.int32) @ quantized) / float(QUANTIZATION_SCALE ** 2)
+        return candidates, similarities
+
+    def query(self, vector, k=5, min_similarity=0.0):
+        """
+        Devuelve las `k` imágenes más parecidas con sus coordenadas almacenadas
+        """
+        segments, records = self._segments()
+        code = simhash_code(vector)
+        quantized = np.clip(np.rint(vector * QUANTIZATION_SCALE), -127, 127).astype(np.int32)
+
+        scored = []
+        for codes, vectors, coords, offset in segments:
+            candidates, similarities = self._search(codes, vectors, code, quantized)
+            for position in np.argsort(similarities)[::-1][:k]:
+                scored.append((float(similarities[position]), int(candidates[position]), coords, offset))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        matches = []
+        for similarity, item, coords, offset in scored[:k]:
+            if similarity < min_similarity:
+                break
+            matches.append({
+                **records[offset + item],
+                "similarity": round(similarity, 4),
+                "lat": round(float(coords[item, 0]), 6),
+                "lng": round(float(coords[item, 1]), 6)
+            })
+
+        return matches
+
+    def records(self):
+        """
+        Itera sobre los registros almacenados junto con sus coordenadas
+        """
+        segments, records = self._segments()
+
+        for _, _, coords, offset in segments:
+            for item in range(len(coords)):
+                yield {
+                    **records[offset + item],
+                    "lat": round(float(coords[item, 0]), 6),
+                    "lng": round(float(coords[item, 1]), 6)
+                }
+
+    def save(self):
+        """
+        Persiste el índice en disco (un .npy por array + registros en JSON Lines).
+
+        Bajo el lock solo se toma una instantánea; la escritura se hace fuera
+        para no bloquear las consultas mientras dura.
+        """
+        if not self.path:
+            return
+
+        with self._save_lock:
+            with self._lock:
+                # Sin cambios no se escribe (ni se crea el directorio)
+                if self._unsaved == 0:
+                    return
+                base, size = self._base_size, self._size
+                # Las filas ya escritas no cambian (add solo añade y _reserve
+                # copia a arrays nuevos), así que basta con vistas sin copiar
+                base_arrays = (self._base_codes[:base], self._base_vectors[:base], self._base_coords[:base])
+                delta_arrays = (self._codes[:size], self._vectors[:size], self._coords[:size])
+                records = self._records
+                unsaved, self._unsaved = self._unsaved, 0
+
+            try:
+                self._write(base_arrays, delta_arrays, records, base + size)
+            except Exception:
+                with self._lock:
+                    self._unsaved += unsaved
+                raise
+
+    def _write(self, base_arrays, delta_arrays, records, count):
+        os.makedirs(self.path, exist_ok=True)
+
+        # Escritura a un temporal + os.replace: los procesos que tengan el
+        # archivo anterior mapeado en memoria siguen leyendo una copia válida
+        for name, base_array, delta_array in zip(("codes.npy", "vectors.npy", "coords.npy"), base_arrays, delta_arrays):
+            target = os.path.join(self.path, name)
+            with open(target + ".tmp", "wb") as f:
+                np.save(f, np.concatenate([base_array, delta_array]))
+            os.replace(target + ".tmp", target)
+
+        records_path = os.path.join(self.path, "records.jsonl")
+        with open(records_path + ".tmp", "w", encoding="utf-8") as f:
+            for item in range(count):
+                f.write(json.dumps(records[item], ensure_ascii=False) + "\n")
+        os.replace(records_path + ".tmp", records_path)
+
+    def load(self):
+        """
+        Carga un índice persistido previamente con `save()` como segmento base
+        """
+        mmap_mode = "r" if self.mmap else None
+        try:
+            codes = np.load(os.path.join(self.path, "codes.npy"), mmap_mode=mmap_mode)
+            vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode=mmap_mode)
+            coords = np.load(os.path.join(self.path, "coords.npy"), mmap_mode=mmap_mode)
+            with open(os.path.join(self.path, "records.jsonl"), encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            print(f"⚠️  No se pudo cargar el índice visual: {str(e)}")
+            return
+
+        size = min(len(codes), len(vectors), len(coords), len(records))
+        with self._lock:
+            self._base_codes, self._base_vectors, self._base_coords = codes, vectors, coords
+            self._base_size = size
+            self._records = records[:size]
+            self._size = 0
+            self._codes = np.empty(0, dtype=np.uint64)
+            self._vectors = np.empty((0, FEATURE_DIM), dtype=np.int8)
+            self._coords = np.empty((0, 2), dtype=np.float64)
+            self._unsaved = 0